@@ -2,11 +2,19 @@
 Execution service for handling Azure DevOps CLI command execution.
 Bridges between conversation intents and actual command execution.
 """
+import functools
 import json
 import re
 from enum import Enum
 from typing import Any, Dict, List, Optional, Tuple, Union
 
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+from src.chatbot.api.services.semantic_cache import SemanticCache
+from src.chatbot.config.settings import settings
 from src.chatbot.devops_cli import operations
 from src.chatbot.devops_cli.command_runner import CommandError
 from src.chatbot.utils.logging import get_logger
@@ -30,6 +38,45 @@ class OperationType(str, Enum):
     UNKNOWN = "unknown"
 
 
+# Literal substrings at least one of which every pattern of the intent contains.
+# A message without any of them cannot match the intent, so its regexes are
+# skipped. Intents not listed here are always checked.
+_INTENT_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "list_repositories": ("repo",),
+    "create_repository": ("repo",),
+    "get_repository": ("repo",),
+    "delete_repository": ("repo",),
+    "list_branches": ("branch",),
+    "create_branch": ("branch",),
+    "import_repository": ("import", "bring"),
+    "clone_repository": ("repo",),
+    "create_work_item": ("work", "task", "bug", "story", "issue"),
+    "get_work_item": ("work", "task", "bug", "story", "issue"),
+    "update_work_item": ("work", "task", "bug", "story", "issue"),
+    "list_work_items": ("work", "task", "bug", "stories", "issue"),
+    "add_comment": ("comment",),
+    "list_pipelines": ("pipeline",),
+    "get_pipeline": ("pipeline",),
+    "create_pipeline": ("pipeline",),
+    "delete_pipeline": ("pipeline",),
+    "run_pipeline": ("pipeline",),
+    "list_runs": ("runs", "executions", "builds"),
+    "get_logs": ("logs", "output"),
+    "cancel_run": ("run", "execution", "build"),
+}
+_ALL_INTENT_KEYWORDS = frozenset(k for keywords in _INTENT_KEYWORDS.values() for k in keywords)
+
+# Parameter extraction patterns, compiled once at import
+_PROJECT_RE = re.compile(r"(in|for)\s+project\s+['\"]?([^'\"]+)['\"]?")
+_REPO_RE = re.compile(r"(repository|repo)\s+['\"]?([^'\"]+)['\"]?")
+_NAME_RE = re.compile(r"(named|called|titled)\s+['\"]?([^'\"]+)['\"]?")
+_ID_RE = re.compile(r"(id|number|#)\s*:?\s*(\d+)")
+_WORK_ITEM_TYPE_RE = re.compile(r"(a|an)\s+([a-zA-Z\s]+)\s+(called|named|titled)")
+_DESCRIPTION_RE = re.compile(r"description\s+['\"]?([^'\"]+)['\"]?")
+_SOURCE_BRANCH_RE = re.compile(r"from\s+(branch\s+)?['\"]?([^'\"]+)['\"]?")
+_PIPELINE_RE = re.compile(r"(pipeline|build)\s+['\"]?([^'\"]+)['\"]?")
+
+
 class ExecutionService:
     """
     Service for executing Azure DevOps CLI commands based on conversation intents.
@@ -171,6 +218,59 @@ class ExecutionService:
                 r"stop\s+(a\s+)?(pipeline\s+)?(run|execution|build)",
             ],
         }
+        
+        # One compiled alternation per intent, checked in declaration order
+        self._intent_matchers = [
+            (
+                intent,
+                frozenset(_INTENT_KEYWORDS.get(intent, ())),
+                re.compile("|".join(f"(?:{pattern})" for pattern in patterns)),
+            )
+            for intent, patterns in self.intent_patterns.items()
+        ]
+        
+        # With hyperscan installed, every intent pattern is matched in a
+        # single pass over the message
+        self._intent_db = self._build_intent_db() if hyperscan is not None else None
+        
+        # Both lookups are pure functions of the message, and users repeat
+        # requests often; the wrappers expose cache_info()/cache_clear()
+        self._detect_intent_cached = functools.lru_cache(maxsize=4096)(self._detect_intent)
+        self._extract_parameters_cached = functools.lru_cache(maxsize=4096)(self._extract_parameters)
+        
+        # Optional cache mapping paraphrased messages to a known intent
+        self._semantic_cache = None
+        if settings.ENABLE_SEMANTIC_CACHE:
+            try:
+                self._semantic_cache = SemanticCache(
+                    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                    max_entries=settings.SEMANTIC_CACHE_SIZE,
+                )
+            except ImportError as e:
+                logger.warning("Semantic cache disabled", error=str(e))
+    
+    def _build_intent_db(self):
+        """
+        Compile all intent patterns into one hyperscan database.
+        
+        Returns:
+            The compiled database; pattern IDs are indexes into the intent order
+        """
+        expressions = []
+        ids = []
+        for index, patterns in enumerate(self.intent_patterns.values()):
+            for pattern in patterns:
+                expressions.append(pattern.encode())
+                ids.append(index)
+        
+        db = hyperscan.Database()
+        db.compile(
+            expressions=expressions,
+            ids=ids,
+            elements=len(expressions),
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(expressions),
+        )
+        return db
     
     def detect_intent(self, message: str) -> Tuple[str, float]:
         """
@@ -183,19 +283,76 @@ class ExecutionService:
             A tuple of (intent, confidence) where intent is the detected intent
             and confidence is a float between 0 and 1 indicating confidence level
         """
-        # Convert message to lowercase for matching
-        message_lower = message.lower()
+        # Patterns are unanchored, so surrounding whitespace never affects a match
+        return self._detect_intent_cached(message.lower().strip())
+    
+    def _detect_intent(self, message_lower: str) -> Tuple[str, float]:
+        """
+        Detect the intent of a normalized message.
+        
+        Args:
+            message_lower: The user's message, lowercased and stripped
+            
+        Returns:
+            A tuple of (intent, confidence)
+        """
+        if self._intent_db is not None:
+            matched = set()
+            
+            def on_match(pattern_id, start, end, flags, context):
+                matched.add(pattern_id)
+            
+            self._intent_db.scan(message_lower.encode(), match_event_handler=on_match)
+            if matched:
+                # The earliest declared intent wins, as with the regex path
+                return self._intent_matchers[min(matched)][0], 0.8
+            return "unknown", 0.0
+        
+        # Find which trigger keywords occur, then only run the regexes of
+        # intents that could possibly match
+        present = {keyword for keyword in _ALL_INTENT_KEYWORDS if keyword in message_lower}
         
         # Check for explicit intent matches
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower):
-                    # Simple confidence calculation - more specific patterns get higher confidence
-                    return intent, 0.8
+        for intent, keywords, matcher in self._intent_matchers:
+            if keywords and keywords.isdisjoint(present):
+                continue
+            if matcher.search(message_lower):
+                # Simple confidence calculation - more specific patterns get higher confidence
+                return intent, 0.8
         
         # No intent detected
         return "unknown", 0.0
     
+    def _resolve_intent(self, message: str, mode: ExecutionMode) -> Tuple[str, float]:
+        """
+        Detect the intent of a message, consulting the semantic cache first.
+        
+        Only the intent is cached: parameters always come from the message
+        itself, since paraphrases naming different resources embed closely.
+        The cache is only consulted in LEARN mode, where nothing is executed:
+        close paraphrases can carry different intents ("create repo x" and
+        "delete repo x"), so AUTO and EXECUTE always detect from the message.
+        
+        Args:
+            message: The user's message
+            mode: The execution mode
+            
+        Returns:
+            A tuple of (intent, confidence)
+        """
+        if self._semantic_cache is None or mode != ExecutionMode.LEARN:
+            return self.detect_intent(message)
+        
+        embedding = self._semantic_cache.encode(message)
+        cached = self._semantic_cache.lookup(embedding)
+        if cached is not None:
+            return cached
+        
+        intent, confidence = self.detect_intent(message)
+        if intent != "unknown":
+            self._semantic_cache.add(embedding, (intent, confidence))
+        return intent, confidence
+    
     def extract_parameters(self, intent: str, message: str) -> Dict[str, Any]:
         """
         Extract parameters from a message based on the detected intent.
@@ -207,35 +364,48 @@ class ExecutionService:
         Returns:
             A dictionary of extracted parameters
         """
+        return dict(self._extract_parameters_cached(intent, message))
+    
+    def _extract_parameters(self, intent: str, message: str) -> Tuple[Tuple[str, Any], ...]:
+        """
+        Extract parameters as a hashable tuple of (name, value) pairs.
+        
+        Args:
+            intent: The detected intent
+            message: The user's message
+            
+        Returns:
+            Extracted parameters in insertion order
+        """
         params = {}
         
         # Convert message to lowercase for matching
         message_lower = message.lower()
         
         # Extract project name if present 
-        project_match = re.search(r"(in|for)\s+project\s+['\"]?([^'\"]+)['\"]?", message)
+        project_match = _PROJECT_RE.search(message)
         if project_match:
             params["project"] = project_match.group(2)
         
         # Extract repository name if present
-        repo_match = re.search(r"(repository|repo)\s+['\"]?([^'\"]+)['\"]?", message)
+        repo_match = _REPO_RE.search(message)
         if repo_match:
             params["name"] = repo_match.group(2)
         
         # Extract name/title if present
-        name_match = re.search(r"(named|called|titled)\s+['\"]?([^'\"]+)['\"]?", message)
+        name_match = _NAME_RE.search(message)
         if name_match:
             params["name"] = name_match.group(2)
         
         # Extract ID if present
-        id_match = re.search(r"(id|number|#)\s*:?\s*(\d+)", message)
+        id_match = _ID_RE.search(message)
         if id_match:
             params["id"] = id_match.group(2)
         
         # Extract work item specific parameters
         if intent == "create_work_item":
             # Extract type
-            type_match = re.search(r"(a|an)\s+([a-zA-Z\s]+)\s+(called|named|titled)", message_lower)
+            type_match = _WORK_ITEM_TYPE_RE.search(message_lower)
             if type_match:
                 params["work_item_type"] = type_match.group(2).strip()
             
@@ -244,14 +414,14 @@ class ExecutionService:
                 params["title"] = params.pop("name")
             
             # Extract description if present
-            desc_match = re.search(r"description\s+['\"]?([^'\"]+)['\"]?", message_lower)
+            desc_match = _DESCRIPTION_RE.search(message_lower)
             if desc_match:
                 params["description"] = desc_match.group(1)
         
         # Extract branch specific parameters
         if intent == "create_branch":
             # Extract source branch
-            source_match = re.search(r"from\s+(branch\s+)?['\"]?([^'\"]+)['\"]?", message_lower)
+            source_match = _SOURCE_BRANCH_RE.search(message_lower)
             if source_match:
                 params["source_branch"] = source_match.group(2)
             
@@ -262,11 +432,11 @@ class ExecutionService:
         # Process pipeline specific parameters
         if intent in ["run_pipeline", "get_pipeline", "get_logs"]:
             # Extract pipeline name
-            pipeline_match = re.search(r"(pipeline|build)\s+['\"]?([^'\"]+)['\"]?", message_lower)
+            pipeline_match = _PIPELINE_RE.search(message_lower)
             if pipeline_match:
                 params["name"] = pipeline_match.group(2)
         
-        return params
+        return tuple(params.items())
     
     def get_operation_type(self, intent: str) -> OperationType:
         """
@@ -471,7 +641,7 @@ class ExecutionService:
         
         try:
             # Detect intent
-            intent, confidence = self.detect_intent(message)
+            intent, confidence = self._resolve_intent(message, mode)
             result["intent"] = intent
             result["confidence"] = confidence
             
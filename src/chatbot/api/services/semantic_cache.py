@@ -0,0 +1,188 @@
+"""
+Semantic cache for execution intents.
+Reuses the intent of a previously seen message when a new message is a close paraphrase.
+"""
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+from src.chatbot.utils.logging import get_logger
+
+# Configure logger
+logger = get_logger(__name__)
+
+
+class SemanticCache:
+    """
+    Bounded LRU cache keyed by sentence-embedding cosine similarity.
+
+    Embeddings are L2-normalized, so the inner product equals the cosine
+    similarity. Lookups use an hnswlib graph when available (same HNSW
+    parameters as the Azure Search index), then a faiss inner-product
+    index, and otherwise a single matrix-vector product over a contiguous
+    float32 bank of the cached vectors.
+    """
+
+    # HNSW parameters shared with the Azure Search vector index
+    HNSW_M = 4
+    HNSW_EF_CONSTRUCTION = 400
+    HNSW_EF_SEARCH = 500
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        threshold: float = 0.87,
+        max_entries: int = 1024,
+        encoder: Optional[Callable[[List[str]], np.ndarray]] = None,
+    ):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            model_name: sentence-transformers model used to embed messages
+            threshold: Minimum cosine similarity for a cache hit
+            max_entries: Maximum number of cached entries before the least
+                recently used one is evicted
+            encoder: Optional callable mapping a list of texts to normalized
+                embeddings; defaults to the sentence-transformers model
+        """
+        if encoder is None:
+            if SentenceTransformer is None:
+                raise ImportError("sentence-transformers is required for the semantic cache")
+            model = SentenceTransformer(model_name)
+            encoder = lambda texts: model.encode(texts, normalize_embeddings=True)
+
+        self._encoder = encoder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Any]" = OrderedDict()
+        self._index = None
+        # Fallback storage: rows [0, count) of the bank hold live vectors,
+        # and the two mappings tie rows to entry ids
+        self._bank: Optional[np.ndarray] = None
+        self._row_ids: List[int] = []
+        self._id_rows: Dict[int, int] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def encode(self, message: str) -> np.ndarray:
+        """
+        Embed a message.
+
+        Args:
+            message: The user's message
+
+        Returns:
+            Normalized float32 embedding of shape (1, dim)
+        """
+        return np.asarray(self._encoder([message]), dtype=np.float32).reshape(1, -1)
+
+    def lookup(self, embedding: np.ndarray) -> Optional[Any]:
+        """
+        Find the cached value of the most similar message.
+
+        Args:
+            embedding: Embedding returned by encode()
+
+        Returns:
+            The cached value, or None if no entry reaches the threshold
+        """
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            if hnswlib is not None:
+                ids, distances = self._index.knn_query(embedding, k=1)
+                score, entry_id = 1.0 - float(distances[0, 0]), int(ids[0, 0])
+            elif faiss is not None:
+                scores, ids = self._index.search(embedding, 1)
+                score, entry_id = float(scores[0, 0]), int(ids[0, 0])
+            else:
+                scores = self._bank[:len(self._row_ids)] @ embedding[0]
+                best = int(np.argmax(scores))
+                score, entry_id = float(scores[best]), self._row_ids[best]
+
+            if entry_id not in self._entries or score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return self._entries[entry_id]
+
+    def add(self, embedding: np.ndarray, value: Any) -> None:
+        """
+        Cache a value under a message embedding.
+
+        Args:
+            embedding: Embedding returned by encode()
+            value: Value to return for similar messages
+        """
+        with self._lock:
+            entry_id = next(self._ids)
+            if hnswlib is not None:
+                if self._index is None:
+                    self._index = hnswlib.Index(space="cosine", dim=embedding.shape[1])
+                    # Slots of evicted entries are reused, so the graph never
+                    # grows past max_entries
+                    self._index.init_index(
+                        max_elements=self.max_entries + 1,
+                        ef_construction=self.HNSW_EF_CONSTRUCTION,
+                        M=self.HNSW_M,
+                        allow_replace_deleted=True,
+                    )
+                    self._index.set_ef(self.HNSW_EF_SEARCH)
+                self._index.add_items(embedding, [entry_id], replace_deleted=True)
+            elif faiss is not None:
+                if self._index is None:
+                    self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(embedding.shape[1]))
+                self._index.add_with_ids(embedding, np.array([entry_id], dtype=np.int64))
+            else:
+                if self._bank is None:
+                    self._bank = np.zeros((self.max_entries + 1, embedding.shape[1]), dtype=np.float32)
+                self._bank[len(self._row_ids)] = embedding[0]
+                self._id_rows[entry_id] = len(self._row_ids)
+                self._row_ids.append(entry_id)
+            self._entries[entry_id] = value
+
+            while len(self._entries) > self.max_entries:
+                evicted_id, _ = self._entries.popitem(last=False)
+                if hnswlib is not None:
+                    self._index.mark_deleted(evicted_id)
+                elif faiss is not None:
+                    self._index.remove_ids(np.array([evicted_id], dtype=np.int64))
+                else:
+                    self._remove_row(evicted_id)
+
+    def _remove_row(self, entry_id: int) -> None:
+        """Drop an entry from the bank by moving the last row into its place."""
+        row = self._id_rows.pop(entry_id)
+        last_id = self._row_ids.pop()
+        if last_id != entry_id:
+            self._bank[row] = self._bank[len(self._row_ids)]
+            self._row_ids[row] = last_id
+            self._id_rows[last_id] = row
@@ -49,6 +49,11 @@ class Settings:
     # Metrics Collection
     ENABLE_METRICS: bool = os.getenv("ENABLE_METRICS", "True").lower() == "true"
     
+    # Semantic intent cache (requires sentence-transformers)
+    ENABLE_SEMANTIC_CACHE: bool = os.getenv("ENABLE_SEMANTIC_CACHE", "False").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.87"))
+    SEMANTIC_CACHE_SIZE: int = int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))
+    
     @property
     def is_production(self) -> bool:
         """Check if the environment is production."""
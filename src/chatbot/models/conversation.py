@@ -2,9 +2,15 @@
 Conversation model for managing chat context and history.
 """
 import json
+import sys
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple, Union
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from src.chatbot.api.services.execution_service import ExecutionMode, execution_service
 from src.chatbot.api.services.openai_service import openai_service
 from src.chatbot.utils.logging import get_logger
@@ -13,12 +19,18 @@ from src.chatbot.utils.logging import get_logger
 logger = get_logger(__name__)
 
 
-@dataclass
+@dataclass(frozen=True)
 class Message:
-    """A message in a conversation."""
+    """A message in a conversation. Immutable, so cached API payloads stay valid."""
+    __slots__ = ("role", "content")
+    
     role: str  # 'system', 'user', or 'assistant'
     content: str
     
+    def __post_init__(self):
+        """Share one string object per role across all messages."""
+        object.__setattr__(self, "role", sys.intern(self.role))
+    
     def to_dict(self) -> Dict[str, str]:
         """Convert the message to a dictionary for API requests."""
         return {"role": self.role, "content": self.content}
@@ -43,17 +55,28 @@ class Conversation:
     Handles sending messages to Azure OpenAI and processing responses.
     """
     system_prompt: str
-    messages: List[Message] = field(default_factory=list)
     max_history: int = 10  # Maximum number of messages to keep in history
     execution_mode: ExecutionMode = ExecutionMode.LEARN  # Default to learn mode
+    # History is only changed through the methods below, which keep the
+    # API-ready dicts in lockstep with it
+    _messages: List[Message] = field(default_factory=list, init=False)
+    _api_messages: List[Dict[str, str]] = field(default_factory=list, init=False, repr=False, compare=False)
     
     def __post_init__(self):
         """Initialize the conversation with the system prompt."""
-        self.messages = [Message(role="system", content=self.system_prompt)]
+        self._messages = [Message(role="system", content=self.system_prompt)]
+        self._api_messages = [self._messages[0].to_dict()]
+    
+    @property
+    def messages(self) -> Tuple[Message, ...]:
+        """Read-only view of the conversation history."""
+        return tuple(self._messages)
     
     def add_message(self, role: str, content: str) -> None:
         """Add a message to the conversation."""
-        self.messages.append(Message(role=role, content=content))
+        message = Message(role=role, content=content)
+        self._messages.append(message)
+        self._api_messages.append(message.to_dict())
         self._trim_history()
         logger.info(f"Added {role} message", extra={"message_length": len(content)})
     
@@ -70,16 +93,17 @@ class Conversation:
         Trim the conversation history to maximum length.
         Always keeps the system prompt as the first message.
         """
-        if len(self.messages) <= self.max_history:
+        if len(self._messages) <= self.max_history:
             return
             
         # Keep system prompt (first message) and most recent messages
-        self.messages = [self.messages[0]] + self.messages[-(self.max_history-1):]
-        logger.debug("Trimmed conversation history", extra={"new_length": len(self.messages)})
+        self._messages = [self._messages[0]] + self._messages[-(self.max_history-1):]
+        self._api_messages = [self._api_messages[0]] + self._api_messages[-(self.max_history-1):]
+        logger.debug("Trimmed conversation history", extra={"new_length": len(self._messages)})
     
     def get_messages_for_api(self) -> List[Dict[str, str]]:
         """Get the messages in a format ready for the API."""
-        return [message.to_dict() for message in self.messages]
+        return list(self._api_messages)
     
     def _check_for_command_execution(self, user_message: str) -> Tuple[bool, Optional[Dict]]:
         """
@@ -127,7 +151,8 @@ class Conversation:
         """
         try:
             # Get the user's last message
-            user_message = self.messages[-1].content if self.messages[-1].role == "user" else None
+            last_message = self._messages[-1]
+            user_message = last_message.content if last_message.role == "user" else None
             if not user_message:
                 logger.warning("No user message found in conversation")
                 return "I'm sorry, I couldn't find your last message."
@@ -203,8 +228,9 @@ class Conversation:
     
     def clear_messages(self) -> None:
         """Clear all messages except the system prompt."""
-        system_prompt = self.messages[0].content
-        self.messages = [Message(role="system", content=system_prompt)]
+        system_prompt = self._messages[0].content
+        self._messages = [Message(role="system", content=system_prompt)]
+        self._api_messages = [self._messages[0].to_dict()]
         logger.info("Cleared conversation history")
     
     def set_execution_mode(self, mode: ExecutionMode) -> None:
@@ -214,15 +240,18 @@ class Conversation:
     
     def to_json(self) -> str:
         """Convert the conversation to a JSON string."""
-        return json.dumps({
-            "messages": [m.to_dict() for m in self.messages],
+        data = {
+            "messages": self._api_messages,
             "execution_mode": self.execution_mode
-        })
+        }
+        if orjson is not None:
+            return orjson.dumps(data).decode()
+        return json.dumps(data)
     
     @classmethod
     def from_json(cls, json_str: str) -> 'Conversation':
         """Create a conversation from a JSON string."""
-        data = json.loads(json_str)
+        data = orjson.loads(json_str) if orjson is not None else json.loads(json_str)
         messages = [Message.from_dict(m) for m in data["messages"]]
         
         # Create a new conversation with the system prompt
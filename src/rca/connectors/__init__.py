@@ -5,9 +5,11 @@ Connectors for external services.
 from src.rca.connectors.azure_openai import AzureOpenAIConnector
 from src.rca.connectors.azure_search import AzureSearchConnector
 from src.rca.connectors.embeddings import AzureAdaEmbeddingService
+from src.rca.connectors.session import create_http_session
 
 __all__ = [
     "AzureOpenAIConnector",
     "AzureSearchConnector",
     "AzureAdaEmbeddingService",
+    "create_http_session",
 ]
@@ -15,6 +15,7 @@ from src.chatbot.config.settings import settings
 from src.rca.connectors.azure_openai import AzureOpenAIConnector
 from src.rca.utils.logging import get_logger
 from src.rca.connectors.embeddings import AzureAdaEmbeddingService
+from src.rca.connectors.session import create_http_session
 
 # Configure logger
 logger = get_logger(__name__)
@@ -34,8 +35,22 @@ class AzureSearchConnector:
     Handles vector search, semantic search, hybrid search, and index management.
     """
     
-    def __init__(self):
-        """Initialize the Azure AI Search connector."""
+    def __init__(
+        self,
+        embedding_service: Optional[AzureAdaEmbeddingService] = None,
+        session: Optional[requests.Session] = None
+    ):
+        """
+        Initialize the Azure AI Search connector.
+        
+        Args:
+            embedding_service: Embedding service for vector queries. If None,
+                one is created that shares this connector's session.
+            session: HTTP session to send requests through. If None, a pooled
+                keep-alive session is created.
+        """
+        self.session = session or create_http_session()
+        
         # Use existing Azure credentials
         self.subscription_id = os.getenv("AZURE_SUBSCRIPTION_ID")
         self.resource_group = os.getenv("AZURE_RESOURCE_GROUP")
@@ -69,7 +84,7 @@ class AzureSearchConnector:
         logger.info(f"Using key: {self.key[:5]}... (first 5 chars)")
         
         # Initialize the embedding service for vector search
-        self.embedding_service = AzureAdaEmbeddingService()
+        self.embedding_service = embedding_service or AzureAdaEmbeddingService(session=self.session)
         
         # Tracking successful initialization
         self.initialized = False
@@ -132,7 +147,7 @@ class AzureSearchConnector:
                     "api-version": self.api_version
                 }
                 
-                response = requests.get(url, headers=headers, params=params, timeout=30)
+                response = self.session.get(url, headers=headers, params=params, timeout=30)
                 
                 if response.status_code == 200:
                     stats = response.json()
@@ -176,7 +191,7 @@ class AzureSearchConnector:
             self.initialized = True
             return True
     
-    def vector_search(self, query, filter=None, top_k=3):
+    def vector_search(self, query, filter=None, top_k=3, embedding=None, select=None):
         """
         Perform vector search using embeddings.
         
@@ -184,6 +199,8 @@ class AzureSearchConnector:
             query: The query to search for
             filter: Filter criteria
             top_k: Number of results to return
+            embedding: Optional precomputed query embedding
+            select: Optional comma-separated fields to return instead of the defaults
             
         Returns:
             List of search results
@@ -197,8 +214,8 @@ class AzureSearchConnector:
         try:
             start_time = time.time()
             
-            # Generate embedding for the query
-            query_vector = self.embedding_service.embed_query(query)
+            # Generate embedding for the query unless one was supplied
+            query_vector = embedding if embedding is not None else self.embedding_service.embed_query(query)
             
             # Prepare vector search request
             search_payload = {
@@ -210,7 +227,7 @@ class AzureSearchConnector:
                         "k": top_k
                     }
                 ],
-                "select": "id,content,category,sourcepage,sourcefile",
+                "select": select or "id,content,category,sourcepage,sourcefile",
                 "top": top_k
             }
             
@@ -225,7 +242,7 @@ class AzureSearchConnector:
                 "Content-Type": "application/json",
                 "api-key": self.key.replace('"', '')
             }
-            response = requests.post(
+            response = self.session.post(
                 search_url,
                 headers=headers,
                 json=search_payload
@@ -253,7 +270,8 @@ class AzureSearchConnector:
         self, 
         query: str, 
         top_k: int = 5,
-        filter=None
+        filter=None,
+        select: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform semantic search using Azure AI Search.
@@ -262,6 +280,7 @@ class AzureSearchConnector:
             query: Query text
             top_k: Number of results to return
             filter: Optional filter expression
+            select: Optional comma-separated fields to return instead of the defaults
             
         Returns:
             List of search results
@@ -290,7 +309,7 @@ class AzureSearchConnector:
                 "queryType": "semantic",
                 "semanticConfiguration": self.semantic_config,
                 "top": top_k,
-                "select": "id,content",
+                "select": select or "id,content",
                 "captions": "extractive",
                 "answers": "extractive",
                 "count": True
@@ -302,7 +321,7 @@ class AzureSearchConnector:
             
             # Make the request
             start_time = time.time()
-            response = requests.post(url, headers=headers, json=search_request)
+            response = self.session.post(url, headers=headers, json=search_request)
             
             if response.status_code == 200:
                 result = response.json()
@@ -324,7 +343,9 @@ class AzureSearchConnector:
         self, 
         query: str, 
         top_k: int = 5,
-        filter=None
+        filter=None,
+        embedding: Optional[List[float]] = None,
+        select: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform hybrid search (vector + semantic) using Azure AI Search.
@@ -333,6 +354,8 @@ class AzureSearchConnector:
             query: Query text
             top_k: Number of results to return
             filter: Optional filter expression
+            embedding: Optional precomputed query embedding
+            select: Optional comma-separated fields to return instead of the defaults
             
         Returns:
             List of search results
@@ -346,8 +369,8 @@ class AzureSearchConnector:
             return self._get_mock_results(top_k)
             
         try:
-            # Get embedding for the query
-            query_embedding = self.embedding_service.embed_query(query)
+            # Get embedding for the query unless one was supplied
+            query_embedding = embedding if embedding is not None else self.embedding_service.embed_query(query)
             
             # Prepare search request
             url = f"{self.endpoint}/indexes/{self.index_name}/docs/search?api-version={self.api_version}"
@@ -372,7 +395,7 @@ class AzureSearchConnector:
                     }
                 ],
                 "top": top_k,
-                "select": "id,content",
+                "select": select or "id,content",
                 "captions": "extractive",
                 "answers": "extractive",
                 "count": True
@@ -384,7 +407,7 @@ class AzureSearchConnector:
             
             # Make the request
             start_time = time.time()
-            response = requests.post(url, headers=headers, json=search_request)
+            response = self.session.post(url, headers=headers, json=search_request)
             
             if response.status_code == 200:
                 result = response.json()
@@ -397,7 +420,7 @@ class AzureSearchConnector:
             elif response.status_code == 400 and "vectorQueries" in str(response.text):
                 # Try fallback to semantic search only
                 logger.info("Falling back to semantic search only")
-                return self.semantic_search(query, top_k, filter)
+                return self.semantic_search(query, top_k, filter, select=select)
             
             logger.error(f"Hybrid search failed: {response.status_code} - {response.text}")
             return self._get_mock_results(top_k)
@@ -8,10 +8,10 @@ import time
 import logging
 import requests
 import numpy as np
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from dotenv import load_dotenv
 from pathlib import Path
 
+from src.rca.connectors.session import create_http_session
 from src.rca.utils.logging import get_logger
 
 # Configure logger
@@ -31,8 +31,16 @@ class AzureAdaEmbeddingService:
     Generates vector embeddings for text to enable semantic search.
     """
     
-    def __init__(self):
-        """Initialize the Azure Ada embedding service."""
+    def __init__(self, session: Optional[requests.Session] = None):
+        """
+        Initialize the Azure Ada embedding service.
+        
+        Args:
+            session: HTTP session to send requests through. If None, a pooled
+                keep-alive session is created.
+        """
+        self.session = session or create_http_session()
+        
         # Azure OpenAI settings from environment variables
         self.api_key = os.getenv("AZURE_OPENAI_API_KEY", "")
         self.endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "")
@@ -119,7 +127,7 @@ class AzureAdaEmbeddingService:
                     "model": self.embedding_model
                 }
                 
-                response = requests.post(
+                response = self.session.post(
                     url, 
                     headers=headers, 
                     params=params, 
@@ -162,15 +170,19 @@ class AzureAdaEmbeddingService:
             self.initialized = True
             return True  # Still return True to allow the system to work with mock data
     
-    def embed_query(self, text: str) -> List[float]:
+    def embed_query(self, text: str, fallback: bool = True) -> Optional[List[float]]:
         """
         Generate an embedding for a single query text.
         
         Args:
             text: The text to embed
+            fallback: Return a random mock embedding when the API is not
+                available or the request fails. If False, None is returned
+                instead, so callers can tell a real embedding from a mock one.
             
         Returns:
-            List of floating point numbers representing the embedding vector
+            List of floating point numbers representing the embedding vector,
+            or None if fallback is False and no real embedding was produced
         """
         # Initialize if not already done
         if not self.initialized:
@@ -178,7 +190,7 @@ class AzureAdaEmbeddingService:
         
         # Use mock data if API is not available
         if self.use_mock:
-            return self._get_mock_embedding()
+            return self.get_mock_embedding() if fallback else None
             
         try:
             start_time = time.time()
@@ -190,11 +202,11 @@ class AzureAdaEmbeddingService:
                 return embeddings[0]
             else:
                 logger.error("Failed to generate embedding for query")
-                return self._get_mock_embedding()
                 
         except Exception as e:
             logger.error(f"Error generating query embedding: {str(e)}")
-            return self._get_mock_embedding()
+        
+        return self.get_mock_embedding() if fallback else None
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
@@ -212,7 +224,7 @@ class AzureAdaEmbeddingService:
             
         # Use mock data if API is not available
         if self.use_mock:
-            return [self._get_mock_embedding() for _ in texts]
+            return [self.get_mock_embedding() for _ in texts]
             
         if not texts:
             return []
@@ -238,16 +250,60 @@ class AzureAdaEmbeddingService:
                 
         except Exception as e:
             logger.error(f"Error generating document embeddings: {str(e)}")
-            return [self._get_mock_embedding() for _ in texts]
+            return [self.get_mock_embedding() for _ in texts]
+    
+    def embed_batch(self, queries: List[str], batch_size: int = 16) -> List[Optional[List[float]]]:
+        """
+        Generate embeddings for many queries with one API call per batch.
+        
+        Deployments that only accept a single input per request are handled
+        by dropping to one query per call for the remaining batches.
+        
+        Args:
+            queries: List of query texts to embed
+            batch_size: Number of queries to send per request
+            
+        Returns:
+            List of embedding vectors, in the same order as the queries. A
+            query that could not be embedded gets None rather than a mock
+            vector, so callers never mistake a failure for a real embedding.
+        """
+        # Initialize if not already done
+        if not self.initialized:
+            self.initialize()
+            
+        # Use mock data if API is not available
+        if self.use_mock:
+            return [self.get_mock_embedding() for _ in queries]
+        
+        embeddings = []
+        i = 0
+        while i < len(queries):
+            batch = queries[i:i + batch_size]
+            try:
+                batch_embeddings = self._get_embeddings_with_retry(batch)
+                if len(batch_embeddings) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings, got {len(batch_embeddings)}")
+            except Exception as e:
+                if batch_size > 1:
+                    logger.warning(f"Batched embedding request failed ({str(e)}), retrying one query per request")
+                    batch_size = 1
+                    continue
+                logger.error(f"Error generating query embedding: {str(e)}")
+                batch_embeddings = [None]
+            
+            embeddings.extend(batch_embeddings)
+            i += len(batch)
+        
+        return embeddings
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((requests.RequestException, TimeoutError))
-    )
     def _get_embeddings_with_retry(self, texts: List[str]) -> List[List[float]]:
         """
-        Get embeddings with retry logic for handling transient errors.
+        Get embeddings for a list of texts.
+        
+        Transient failures (connection errors, 429 and 5xx responses) are
+        retried by the session from create_http_session, so there is no
+        second retry layer here to multiply attempts while throttled.
         
         Args:
             texts: List of texts to embed
@@ -273,7 +329,7 @@ class AzureAdaEmbeddingService:
         }
         
         # Make the request
-        response = requests.post(url, headers=headers, params=params, json=request_body, timeout=30)
+        response = self.session.post(url, headers=headers, params=params, json=request_body, timeout=30)
         
         if response.status_code != 200:
             error_msg = "Unknown error"
@@ -302,9 +358,9 @@ class AzureAdaEmbeddingService:
             
         return embeddings
     
-    def _get_mock_embedding(self) -> List[float]:
+    def get_mock_embedding(self) -> List[float]:
         """
-        Generate a mock embedding for testing.
+        Generate a mock embedding for testing or as a stand-in when the API fails.
         
         Returns:
             List of floating point numbers representing a random embedding
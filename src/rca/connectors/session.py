@@ -0,0 +1,44 @@
+"""
+HTTP session helpers for the RCA connectors.
+Provides pooled keep-alive sessions shared between Azure service clients.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_http_session(pool_connections: int = 10, pool_maxsize: int = 20) -> requests.Session:
+    """
+    Create a pooled HTTP session for Azure REST calls.
+
+    Connections are kept alive between requests so repeated calls skip the
+    TCP and TLS handshakes. Connection errors, throttled (429) and server
+    error (500/502/503/504) responses are retried with backoff, honouring
+    Retry-After, before being returned to the caller. This is the only retry
+    layer for calls made through the session; callers should not add their own.
+
+    Args:
+        pool_connections: Number of per-host connection pools to cache
+        pool_maxsize: Maximum number of connections kept per host
+
+    Returns:
+        Configured requests session
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    # Plain-http endpoints (local emulators, proxies) get the same retries
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -2,31 +2,169 @@
 Workflow tracking system for the RCA pipeline.
 Provides tracing of inputs, outputs, and performance for each step.
 """
-import time
-import uuid
-from datetime import datetime
-from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, Field
-import os
+import functools
+import hashlib
+import heapq
+import io
+import itertools
 import json
+import logging
+import os
 import pickle
+import queue
+import secrets
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+from typing_extensions import Annotated
+
+try:
+    import zstandard as zstd
+except ImportError:
+    # Trace files are written uncompressed without zstandard
+    zstd = None
+
+from src.rca.utils.logging import get_logger
+
+# Configure logger
+logger = get_logger(__name__)
+
+# Header marking a trace file written with out-of-band pickle buffers
+_OOB_MAGIC = b"PKB5"
+_FRAME_HEADER = struct.Struct("<Q")
+# Header marking a zstd-compressed trace file
+_ZSTD_MAGIC = b"ZST1"
+
+# Step input/output values at least this long are stored once as shared blobs
+_INTERN_MIN_SIZE = 1024
+
+
+class _BlobRef(NamedTuple):
+    """Reference to an interned step value in a pickled trace.
+    
+    A private class rather than a marker dict, so no user-supplied input or
+    output can be mistaken for a reference when the trace is loaded.
+    """
+    digest: str
+    kind: str
+
+
+def _is_large_value(value: Any) -> bool:
+    """Whether a step value is big enough to be interned as a blob"""
+    return isinstance(value, (str, bytes)) and len(value) >= _INTERN_MIN_SIZE
+
+
+def _is_blob_ref(value: Any) -> bool:
+    """Whether a step value is a reference written by _intern_value"""
+    return isinstance(value, _BlobRef)
+
+
+def _frame_trace(data: memoryview, buffers: List[pickle.PickleBuffer]) -> List[Any]:
+    """Build the chunks to write to disk for a protocol 5 pickle.
+
+    Large buffers (numpy arrays, PickleBuffer payloads) are kept out-of-band
+    and written as separate length-prefixed frames instead of being copied
+    into the main pickle stream. Traces without such buffers are written as
+    a plain pickle.
+    """
+    if not buffers:
+        return [data]
+
+    chunks = [_OOB_MAGIC, _FRAME_HEADER.pack(len(buffers) + 1)]
+    for frame in [data] + [buf.raw() for buf in buffers]:
+        chunks.append(_FRAME_HEADER.pack(frame.nbytes))
+        chunks.append(frame)
+    return chunks
+
+
+def _load_trace(data: bytes) -> "WorkflowTrace":
+    """Deserialize a pickled trace, including chunks built by `_frame_trace`"""
+    if not data.startswith(_OOB_MAGIC):
+        return pickle.loads(data)
+
+    view = memoryview(data)
+    offset = len(_OOB_MAGIC)
+    (count,) = _FRAME_HEADER.unpack_from(view, offset)
+    offset += _FRAME_HEADER.size
+    frames = []
+    for _ in range(count):
+        (size,) = _FRAME_HEADER.unpack_from(view, offset)
+        offset += _FRAME_HEADER.size
+        frames.append(view[offset:offset + size])
+        offset += size
+    return pickle.loads(frames[0], buffers=frames[1:])
 
 
-class StepTrace(BaseModel):
-    """Trace information for a single step in the workflow"""
+# Trace IDs only need to be unique per storage directory: a random
+# per-process prefix plus a counter avoids a urandom call per trace
+_TRACE_ID_PREFIX = secrets.token_hex(8)
+_TRACE_ID_COUNTER = itertools.count()
+
+
+def _reseed_trace_ids() -> None:
+    """Give a forked child its own prefix so it cannot repeat the parent's IDs"""
+    global _TRACE_ID_PREFIX, _TRACE_ID_COUNTER
+    _TRACE_ID_PREFIX = secrets.token_hex(8)
+    _TRACE_ID_COUNTER = itertools.count()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reseed_trace_ids)
+
+
+def _new_trace_id() -> str:
+    """Return a process-unique, monotonically increasing trace ID"""
+    return f"{_TRACE_ID_PREFIX}-{next(_TRACE_ID_COUNTER):012x}"
+
+
+def _elapsed_ms(t0_ns: int) -> float:
+    """Milliseconds since a perf_counter_ns() reading"""
+    return (time.perf_counter_ns() - t0_ns) * 1e-6
+
+
+# Default trace directory (<repo>/data/traces), resolved once per process
+_DEFAULT_STORAGE_DIR = Path(__file__).resolve().parents[3] / 'data' / 'traces'
+
+# Slotted dataclasses need Python 3.10+; older interpreters get a plain dataclass
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_SLOTS)
+class StepTrace:
+    """
+    Trace information for a single step in the workflow.
+    
+    A slotted dataclass rather than a BaseModel: workflows hold many steps, and
+    this drops the per-instance __dict__ and pydantic bookkeeping. pydantic
+    still validates and serializes it as a field of WorkflowTrace.
+    """
     step_name: str
     inputs: Dict[str, Any]
-    outputs: Dict[str, Any] 
+    outputs: Dict[str, Any]
     start_time: datetime
     end_time: Optional[datetime] = None
     duration_ms: Optional[float] = None
-    metadata: Dict[str, Any] = Field(default_factory=dict)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # Monotonic start used for duration; start_time is kept for display
+    _t0_ns: Annotated[int, Field(exclude=True)] = field(
+        default_factory=time.perf_counter_ns, init=False, repr=False, compare=False
+    )
 
 
 class WorkflowTrace(BaseModel):
     """Complete trace of a workflow execution"""
-    trace_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    model_config = ConfigDict(extra='forbid', arbitrary_types_allowed=True)
+    
+    trace_id: str = Field(default_factory=_new_trace_id)
     query: str
     start_time: datetime = Field(default_factory=datetime.now)
     end_time: Optional[datetime] = None
@@ -34,6 +172,7 @@ class WorkflowTrace(BaseModel):
     steps: List[StepTrace] = Field(default_factory=list)
     final_response: Optional[str] = None
     metadata: Dict[str, Any] = Field(default_factory=dict)
+    _t0_ns: int = PrivateAttr(default_factory=time.perf_counter_ns)
     
     def add_step(self, step_name: str, inputs: Dict[str, Any]) -> StepTrace:
         """Add a new step to the trace"""
@@ -50,39 +189,203 @@ class WorkflowTrace(BaseModel):
         """Complete a step with outputs and timing information"""
         step.outputs = outputs
         step.end_time = datetime.now()
-        step.duration_ms = (step.end_time - step.start_time).total_seconds() * 1000
+        step.duration_ms = _elapsed_ms(step._t0_ns)
     
     def complete_workflow(self, final_response: str):
         """Complete the workflow trace"""
         self.end_time = datetime.now()
-        self.duration_ms = (self.end_time - self.start_time).total_seconds() * 1000
+        self.duration_ms = _elapsed_ms(self._t0_ns)
         self.final_response = final_response
 
 
 class FileStorageBackend:
     """Simple file-based storage backend for workflow traces"""
     
-    def __init__(self, storage_dir=None):
-        """Initialize the file storage backend"""
+    # File extension used for each supported serialization format
+    FORMATS = {"pickle": ".pkl", "json": ".json"}
+    
+    def __init__(self, storage_dir=None, format: str = "pickle"):
+        """
+        Initialize the file storage backend
+        
+        Args:
+            storage_dir: Directory for trace files. Defaults to data/traces.
+            format: "pickle" (default, handles arbitrary step payloads) or
+                "json", which uses pydantic's compiled serializer and decodes
+                straight back into typed models.
+        """
+        if format not in self.FORMATS:
+            raise ValueError(f"Unsupported trace format: {format}")
+        self.format = format
+        self._extension = self.FORMATS[format]
+        
         if storage_dir is None:
-            base_dir = Path(__file__).resolve().parent.parent.parent.parent
-            storage_dir = os.path.join(base_dir, 'data', 'traces')
+            storage_dir = str(_DEFAULT_STORAGE_DIR)
             
-        os.makedirs(storage_dir, exist_ok=True)
+        if not os.path.isdir(storage_dir):
+            os.makedirs(storage_dir, exist_ok=True)
         self.storage_dir = storage_dir
-        print(f"Trace storage initialized at: {self.storage_dir}")
+        
+        # Newest-first trace file names and the directory mtime they were listed
+        # at, so unchanged directories are not re-read. Trace files are only
+        # unpickled when requested, through a bounded LRU cache.
+        self._trace_files: List[str] = []
+        self._last_mtime_ns: Optional[int] = None
+        
+        # Large step values of pickled traces are content-addressed into
+        # blobs/<digest>.bin
+        self.blob_dir = os.path.join(storage_dir, 'blobs')
+        if not os.path.isdir(self.blob_dir):
+            os.makedirs(self.blob_dir, exist_ok=True)
+        self._known_blobs = set()
+        self._read_blob = functools.lru_cache(maxsize=128)(self._read_blob_file)
+        self._load_one = functools.lru_cache(maxsize=128)(self._read_trace_file)
+        
+        # One Pickler and output buffer reused for every trace; the lock also
+        # covers writes from BatchedStorageBackend's worker thread
+        self._buf = io.BytesIO()
+        self._oob_buffers: List[pickle.PickleBuffer] = []
+        self._pickler = pickle.Pickler(self._buf, protocol=5, buffer_callback=self._oob_buffers.append)
+        self._lock = threading.Lock()
+        
+        # Level 1 zstd: several times fewer bytes written for a few µs of CPU.
+        # The compressor is only used under _lock; readers share the
+        # decompressor under their own lock so they never wait on a write
+        self._cctx = zstd.ZstdCompressor(level=1) if zstd else None
+        self._dctx = zstd.ZstdDecompressor() if zstd else None
+        self._dctx_lock = threading.Lock()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Trace storage initialized at: %s", self.storage_dir)
+    
+    def _intern_value(self, value: Any) -> Any:
+        """Replace a large str/bytes value with a reference to a shared blob"""
+        if not _is_large_value(value):
+            return value
+        
+        kind = "str" if isinstance(value, str) else "bytes"
+        data = value.encode() if kind == "str" else value
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if digest not in self._known_blobs:
+            blob_file = os.path.join(self.blob_dir, f"{digest}.bin")
+            if not os.path.exists(blob_file):
+                self._write_blob_file(blob_file, data)
+            self._known_blobs.add(digest)
+        return _BlobRef(digest, kind)
+    
+    def _write_blob_file(self, blob_file: str, data: bytes):
+        """Write a blob through a temporary file so readers never see it partial"""
+        fd, tmp_file = tempfile.mkstemp(dir=self.blob_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, blob_file)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
+    
+    def _read_blob_file(self, digest: str, kind: str) -> Any:
+        """Read a blob written by _intern_value"""
+        with open(os.path.join(self.blob_dir, f"{digest}.bin"), 'rb') as f:
+            data = f.read()
+        return data.decode() if kind == "str" else data
+    
+    def _resolve_value(self, value: Any) -> Any:
+        """Inverse of _intern_value"""
+        if _is_blob_ref(value):
+            return self._read_blob(value.digest, value.kind)
+        return value
+    
+    def _map_step_values(self, trace: WorkflowTrace, fn, applies) -> WorkflowTrace:
+        """
+        Apply fn to every step input and output value for which applies() is true.
+        
+        Steps without such values are shared with the original, and the trace
+        itself is returned uncopied when no step has any.
+        """
+        steps = []
+        changed = False
+        for step in trace.steps:
+            if any(applies(v) for v in step.inputs.values()) or \
+                    any(applies(v) for v in step.outputs.values()):
+                step = replace(
+                    step,
+                    inputs={k: fn(v) for k, v in step.inputs.items()},
+                    outputs={k: fn(v) for k, v in step.outputs.items()},
+                )
+                changed = True
+            steps.append(step)
+        if not changed:
+            return trace
+        
+        return trace.model_copy(update={"steps": steps})
+    
+    def _write_trace_file(self, trace: WorkflowTrace, trace_file: str):
+        """Serialize a trace and write it to trace_file"""
+        if self.format == "json":
+            # JSON has no type a user value cannot also produce, so large
+            # values are stored inline rather than as blob references
+            with self._lock:
+                self._write_chunks(trace_file, [trace.model_dump_json().encode()])
+            return
+        
+        trace = self._map_step_values(trace, self._intern_value, _is_large_value)
+        with self._lock:
+            # Overwrite from the start instead of truncating, so the buffer's
+            # allocation is kept; only the first `size` bytes are this trace
+            self._buf.seek(0)
+            try:
+                try:
+                    self._pickler.dump(trace)
+                finally:
+                    self._pickler.clear_memo()
+                size = self._buf.tell()
+                with self._buf.getbuffer() as view, view[:size] as data:
+                    chunks = _frame_trace(data, self._oob_buffers)
+                    try:
+                        self._write_chunks(trace_file, chunks)
+                    finally:
+                        # Drop views into the shared buffer before it is released
+                        del chunks[:]
+            finally:
+                # Out-of-band buffers from a failed dump or write must not be
+                # framed with the next trace
+                self._oob_buffers.clear()
+    
+    def _write_chunks(self, trace_file: str, chunks: List[Any]):
+        """Write serialized chunks to trace_file, zstd-compressed if available"""
+        with open(trace_file, 'wb') as f:
+            if self._cctx is None:
+                f.writelines(chunks)
+                return
+            f.write(_ZSTD_MAGIC)
+            size = sum(len(chunk) for chunk in chunks)
+            with self._cctx.stream_writer(f, size=size, closefd=False) as writer:
+                for chunk in chunks:
+                    writer.write(chunk)
+    
+    def _decode(self, data: bytes) -> WorkflowTrace:
+        """Deserialize a trace file and resolve its blob references"""
+        if data.startswith(_ZSTD_MAGIC):
+            if self._dctx is None:
+                raise RuntimeError("zstandard is required to read compressed traces")
+            with self._dctx_lock:
+                data = self._dctx.decompress(memoryview(data)[len(_ZSTD_MAGIC):])
+        if self.format == "json":
+            return WorkflowTrace.model_validate_json(data)
+        trace = _load_trace(data)
+        return self._map_step_values(trace, self._resolve_value, _is_blob_ref)
         
     def store_trace(self, trace: WorkflowTrace):
         """Store a trace to a file"""
-        trace_file = os.path.join(self.storage_dir, f"{trace.trace_id}.pkl")
+        trace_file = os.path.join(self.storage_dir, f"{trace.trace_id}{self._extension}")
         
         try:
-            with open(trace_file, 'wb') as f:
-                pickle.dump(trace, f)
-            print(f"Stored trace {trace.trace_id} to {trace_file}")
+            self._write_trace_file(trace, trace_file)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Stored trace %s to %s", trace.trace_id, trace_file)
             return True
         except Exception as e:
-            print(f"Error storing trace: {str(e)}")
+            logger.error("Error storing trace: %s", e)
             return False
             
     def load_traces(self, limit=None):
@@ -90,55 +393,165 @@ class FileStorageBackend:
         traces = []
         
         try:
-            trace_files = sorted(
-                [f for f in os.listdir(self.storage_dir) if f.endswith('.pkl')],
-                key=lambda x: os.path.getmtime(os.path.join(self.storage_dir, x)),
-                reverse=True
-            )
+            mtime_ns = os.stat(self.storage_dir).st_mtime_ns
+            if mtime_ns != self._last_mtime_ns:
+                with os.scandir(self.storage_dir) as it:
+                    entries = [
+                        (entry.stat().st_mtime_ns, entry.name)
+                        for entry in it if entry.name.endswith(self._extension)
+                    ]
+                entries.sort(reverse=True)
+                self._trace_files = [name for _, name in entries]
+                self._last_mtime_ns = mtime_ns
             
+            trace_files = self._trace_files
             if limit:
                 trace_files = trace_files[:limit]
                 
             for trace_file in trace_files:
                 try:
-                    with open(os.path.join(self.storage_dir, trace_file), 'rb') as f:
-                        trace = pickle.load(f)
-                        traces.append(trace)
+                    traces.append(self._load_one(trace_file))
                 except Exception as e:
-                    print(f"Error loading trace {trace_file}: {str(e)}")
+                    logger.error("Error loading trace %s: %s", trace_file, e)
             
             return traces
         except Exception as e:
-            print(f"Error listing traces: {str(e)}")
+            logger.error("Error listing traces: %s", e)
+            return []
+    
+    def get_trace(self, trace_id: str) -> Optional[WorkflowTrace]:
+        """Load a single trace by ID, or None if it was never stored"""
+        trace_file = f"{trace_id}{self._extension}"
+        try:
+            return self._load_one(trace_file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error("Error loading trace %s: %s", trace_file, e)
+            return None
+    
+    def _read_trace_file(self, trace_file: str) -> WorkflowTrace:
+        """Read and decode one trace file"""
+        with open(os.path.join(self.storage_dir, trace_file), 'rb') as f:
+            return self._decode(f.read())
+
+
+class BatchedStorageBackend:
+    """
+    Write traces to another backend from a background thread.
+    
+    store_trace only enqueues the trace, so completing a workflow never waits
+    on disk. A daemon thread drains the queue in batches of up to batch_size
+    traces and hands each one to the wrapped backend.
+    """
+    
+    def __init__(self, backend=None, batch_size: int = 16):
+        """Wrap a storage backend, defaulting to FileStorageBackend"""
+        self.backend = backend or FileStorageBackend()
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[WorkflowTrace]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._worker.start()
+    
+    def _run(self):
+        """Drain queued traces in batches"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for trace in batch:
+                # A failed write must not kill the thread, or every later
+                # flush would wait forever on the unprocessed queue
+                try:
+                    self.backend.store_trace(trace)
+                except Exception as e:
+                    logger.error("Error storing trace %s: %s", trace.trace_id, e)
+                finally:
+                    self._queue.task_done()
+    
+    def store_trace(self, trace: WorkflowTrace):
+        """Queue a trace for writing"""
+        self._queue.put(trace)
+        return True
+    
+    def flush(self):
+        """Block until every queued trace has been written"""
+        self._queue.join()
+    
+    def load_traces(self, limit=None):
+        """Load traces from the wrapped backend after pending writes land"""
+        if not hasattr(self.backend, 'load_traces'):
             return []
+        self.flush()
+        return self.backend.load_traces(limit=limit)
+    
+    def get_trace(self, trace_id: str) -> Optional[WorkflowTrace]:
+        """Get a trace from the wrapped backend after pending writes land"""
+        if not hasattr(self.backend, 'get_trace'):
+            return None
+        self.flush()
+        return self.backend.get_trace(trace_id)
 
 
 class WorkflowTracker:
     """Track workflow execution with inputs and outputs at each step"""
     
-    def __init__(self):
+    def __init__(self, in_memory_cap: int = 1024):
+        """
+        Initialize the tracker.
+        
+        Args:
+            in_memory_cap: Number of completed traces kept in memory. Older
+                traces are still served from the storage backends.
+        """
         self.active_traces: Dict[str, WorkflowTrace] = {}
-        self.completed_traces: List[WorkflowTrace] = []
+        self.in_memory_cap = in_memory_cap
+        self.completed_traces: "deque[WorkflowTrace]" = deque(maxlen=in_memory_cap)
         self.storage_backends = []
         
-        # Add file storage backend by default
-        self.register_storage_backend(FileStorageBackend())
+        # Index of completed traces by ID and newest-first view, rebuilt on insert
+        self._by_id: Dict[str, WorkflowTrace] = {}
+        self._sorted_cache: Optional[List[WorkflowTrace]] = None
         
-        # Load existing traces on startup
-        self._load_traces_from_storage()
+        # Add file storage backend by default. Stored traces are not read here;
+        # get_trace and get_recent_traces load them on demand.
+        self.register_storage_backend(FileStorageBackend())
     
-    def _load_traces_from_storage(self):
-        """Load traces from storage backends"""
+    def _load_traces_from_storage(self, limit: int):
+        """Load the newest `limit` traces from storage backends"""
         for backend in self.storage_backends:
             if hasattr(backend, 'load_traces'):
-                traces = backend.load_traces()
-                self.completed_traces.extend(traces)
-                print(f"Loaded {len(traces)} traces from storage")
+                loaded = 0
+                # Oldest first, so the newest traces are the last to be evicted
+                for trace in reversed(backend.load_traces(limit=limit)):
+                    if trace.trace_id not in self._by_id:
+                        self._add_completed_trace(trace)
+                        loaded += 1
+                if loaded and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Loaded %d traces from storage", loaded)
+    
+    def _add_completed_trace(self, trace: WorkflowTrace):
+        """Add a trace to the completed set and invalidate the sorted view"""
+        if self.completed_traces and len(self.completed_traces) == self.in_memory_cap:
+            evicted = self.completed_traces[0]
+            self._by_id.pop(evicted.trace_id, None)
+        self.completed_traces.append(trace)
+        self._by_id[trace.trace_id] = trace
+        self._sorted_cache = None
     
     def register_storage_backend(self, backend):
         """Register a storage backend for traces"""
         self.storage_backends.append(backend)
     
+    def flush(self):
+        """Wait for backends that buffer writes; a no-op for the others"""
+        for backend in self.storage_backends:
+            if hasattr(backend, 'flush'):
+                backend.flush()
+    
     def start_trace(self, query: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         """Start tracking a new workflow execution"""
         trace = WorkflowTrace(
@@ -170,7 +583,7 @@ class WorkflowTracker:
         trace.complete_workflow(final_response)
         
         # Store the completed trace
-        self.completed_traces.append(trace)
+        self._add_completed_trace(trace)
         for backend in self.storage_backends:
             backend.store_trace(trace)
             
@@ -181,12 +594,28 @@ class WorkflowTracker:
         if trace_id in self.active_traces:
             return self.active_traces[trace_id]
             
-        for trace in self.completed_traces:
-            if trace.trace_id == trace_id:
-                return trace
-                
+        trace = self._by_id.get(trace_id)
+        if trace is not None:
+            return trace
+        
+        # Fall back to storage for traces evicted from memory
+        for backend in self.storage_backends:
+            if hasattr(backend, 'get_trace'):
+                trace = backend.get_trace(trace_id)
+                if trace is not None:
+                    return trace
+        
         return None
     
     def get_recent_traces(self, limit: int = 10) -> List[WorkflowTrace]:
-        """Get the most recent traces"""
-        return self.completed_traces[-limit:] 
\ No newline at end of file
+        """Get the most recent traces, newest first"""
+        # Materialize only the newest `limit` stored traces, including ones
+        # written by other processes; cheap when the directory is unchanged
+        self._load_traces_from_storage(limit)
+        
+        cache = self._sorted_cache
+        # Rebuild only when invalidated or when a larger slice is requested
+        if cache is None or (len(cache) < limit and len(cache) < len(self.completed_traces)):
+            cache = heapq.nlargest(limit, self.completed_traces, key=lambda t: t.start_time)
+            self._sorted_cache = cache
+        return cache[:limit] 
\ No newline at end of file
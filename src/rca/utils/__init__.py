@@ -3,11 +3,13 @@ Utilities package for the RCA system.
 Provides various utility functions and helpers.
 """
 
-from src.rca.utils.logging import (get_logger, log_conversation_metrics,
+from src.rca.utils.logging import (dumps_json, get_logger,
+                                 log_conversation_metrics,
                                  log_execution_metrics)
 
 __all__ = [
     # Logging utilities
+    'dumps_json',
     'get_logger',
     'log_conversation_metrics',
     'log_execution_metrics',
@@ -4,14 +4,20 @@ Provides tools to benchmark and evaluate search quality and performance.
 """
 from typing import List, Dict, Any, Optional, Union, Tuple
 import time
-import statistics
+import concurrent.futures
+import hashlib
 import json
 import os
+import sqlite3
+import threading
 from datetime import datetime
 
-from src.rca.utils.logging import get_logger
+import numpy as np
+
+from src.rca.utils.logging import dumps_json, get_logger
 from src.rca.connectors.azure_search import AzureSearchConnector
 from src.rca.connectors.embeddings import AzureAdaEmbeddingService
+from src.rca.connectors.session import create_http_session
 
 # Configure logger
 logger = get_logger(__name__)
@@ -23,10 +29,36 @@ class SearchEvaluator:
     Benchmarks and compares vector, semantic, and hybrid search approaches.
     """
     
+    # Search methods that need a query embedding before they can run
+    _EMBEDDING_METHODS = ("vector", "hybrid")
+    
+    # Benchmarked search methods and the connector method that runs each
+    _METHODS = [
+        ("vector", "vector_search"),
+        ("semantic", "semantic_search"),
+        ("hybrid", "hybrid_search"),
+    ]
+    
+    # Number of leading whitespace tokens compared when measuring shared prefixes
+    _PREFIX_TOKENS = 32
+    
     def __init__(self):
         """Initialize the search evaluator."""
-        self.search_connector = AzureSearchConnector()
-        self.embedding_service = AzureAdaEmbeddingService()
+        # One keep-alive session serves every search and embedding call
+        self.session = create_http_session()
+        self.embedding_service = AzureAdaEmbeddingService(session=self.session)
+        self.search_connector = AzureSearchConnector(
+            embedding_service=self.embedding_service,
+            session=self.session
+        )
+        
+        # Worker threads reused by every evaluate_query call
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(self._METHODS), os.cpu_count() or 4)
+        )
+        
+        # Query embeddings shared across methods and runs, keyed by query text
+        self._embedding_cache: Dict[str, List[float]] = {}
         
         # Ensure services are initialized
         self.initialized = False
@@ -34,6 +66,40 @@ class SearchEvaluator:
         # For storing evaluation results
         self.results_dir = os.path.join("data", "evaluation")
         os.makedirs(self.results_dir, exist_ok=True)
+        
+        # Per-query results are appended to one JSONL file per session,
+        # opened on the first write
+        self._session_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._results_fh = None
+        
+        # Embeddings persisted across sessions so re-running a test set
+        # does not re-embed unchanged queries
+        self._cache_lock = threading.Lock()
+        self._cache_stats = {"cache_hits": 0, "cache_misses": 0}
+        self._embedding_db = sqlite3.connect(
+            os.path.join(self.results_dir, "embedding_cache.sqlite"),
+            check_same_thread=False
+        )
+        self._embedding_db.execute(
+            "CREATE TABLE IF NOT EXISTS emb (key TEXT PRIMARY KEY, vec BLOB, created REAL)"
+        )
+        self._embedding_db.commit()
+    
+    def close(self) -> None:
+        """Release the worker pool, results stream, HTTP session and embedding cache."""
+        self._pool.shutdown(wait=True)
+        self.session.close()
+        if self._results_fh is not None:
+            self._results_fh.close()
+            self._results_fh = None
+        with self._cache_lock:
+            self._embedding_db.close()
+    
+    def __enter__(self) -> "SearchEvaluator":
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
     
     def initialize(self) -> bool:
         """
@@ -65,7 +131,9 @@ class SearchEvaluator:
         query: str,
         expected_results: Optional[List[str]] = None,
         top_k: int = 5,
-        run_count: int = 3
+        run_count: int = 3,
+        parallel: bool = True,
+        save: bool = True
     ) -> Dict[str, Any]:
         """
         Evaluate a single query using different search methods.
@@ -75,6 +143,9 @@ class SearchEvaluator:
             expected_results: Optional list of expected document IDs
             top_k: Number of results to retrieve
             run_count: Number of times to run each method for timing
+            parallel: Benchmark the search methods concurrently. Set to False
+                to keep the methods from competing for bandwidth while timed.
+            save: Append the result to the session's results stream
             
         Returns:
             Evaluation results
@@ -90,54 +161,58 @@ class SearchEvaluator:
             "methods": {},
         }
         
-        # Evaluate vector search
-        vector_results, vector_metrics = self._benchmark_search_method(
-            method_name="vector",
-            search_fn=self.search_connector.vector_search,
-            query=query,
-            top_k=top_k,
-            expected_results=expected_results,
-            run_count=run_count
-        )
-        results["methods"]["vector"] = {
-            "metrics": vector_metrics,
-            "results": vector_results
+        search_methods = [
+            (method_name, getattr(self.search_connector, attr))
+            for method_name, attr in self._METHODS
+        ]
+        # Resolve the embedding once, before any timer starts, so vector and
+        # hybrid share it and their latencies measure only the search
+        benchmark_kwargs = {
+            "query": query,
+            "top_k": top_k,
+            "expected_results": expected_results,
+            "run_count": run_count,
+            "embedding": self._get_query_embedding(query),
         }
         
-        # Evaluate semantic search
-        semantic_results, semantic_metrics = self._benchmark_search_method(
-            method_name="semantic",
-            search_fn=self.search_connector.semantic_search,
-            query=query,
-            top_k=top_k,
-            expected_results=expected_results,
-            run_count=run_count
-        )
-        results["methods"]["semantic"] = {
-            "metrics": semantic_metrics,
-            "results": semantic_results
-        }
+        benchmarks = {}
+        if parallel:
+            # Each method is an independent network round-trip, so overlap them;
+            # the timed runs within a method stay serial
+            futures = {
+                self._pool.submit(
+                    self._benchmark_search_method,
+                    method_name=method_name,
+                    search_fn=search_fn,
+                    **benchmark_kwargs
+                ): method_name
+                for method_name, search_fn in search_methods
+            }
+            for future in concurrent.futures.as_completed(futures):
+                benchmarks[futures[future]] = future.result()
+        else:
+            for method_name, search_fn in search_methods:
+                benchmarks[method_name] = self._benchmark_search_method(
+                    method_name=method_name,
+                    search_fn=search_fn,
+                    **benchmark_kwargs
+                )
         
-        # Evaluate hybrid search
-        hybrid_results, hybrid_metrics = self._benchmark_search_method(
-            method_name="hybrid",
-            search_fn=self.search_connector.hybrid_search,
-            query=query,
-            top_k=top_k,
-            expected_results=expected_results,
-            run_count=run_count
-        )
-        results["methods"]["hybrid"] = {
-            "metrics": hybrid_metrics,
-            "results": hybrid_results
-        }
+        # Keep the methods in a stable order regardless of completion order
+        for method_name, _ in search_methods:
+            method_results, method_metrics = benchmarks[method_name]
+            results["methods"][method_name] = {
+                "metrics": method_metrics,
+                "results": method_results
+            }
         
         # Calculate overall recommendations
         best_method = self._determine_best_method(results["methods"])
         results["best_method"] = best_method
         
         # Save results
-        self._save_evaluation_results(query, results)
+        if save:
+            self._append_result(results)
         
         return results
     
@@ -148,11 +223,16 @@ class SearchEvaluator:
         query: str,
         top_k: int,
         expected_results: Optional[List[str]] = None,
-        run_count: int = 3
+        run_count: int = 3,
+        embedding: Optional[List[float]] = None
     ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
         """
         Benchmark a specific search method.
         
+        Only the first run fetches full documents, which are used for the
+        relevance metrics; later runs request document IDs only so their
+        timing reflects the search itself rather than payload size.
+        
         Args:
             method_name: Name of the search method
             search_fn: Search function to call
@@ -160,20 +240,29 @@ class SearchEvaluator:
             top_k: Number of results to retrieve
             expected_results: Optional list of expected document IDs
             run_count: Number of times to run for timing
+            embedding: Query embedding for methods that need one; looked up
+                before timing starts when not given
             
         Returns:
             Tuple of (results, metrics)
         """
         logger.info(f"Benchmarking {method_name} search for query: '{query}'")
+        if method_name in self._EMBEDDING_METHODS and embedding is None:
+            embedding = self._get_query_embedding(query)
+        expected_set = frozenset(expected_results) if expected_results else None
         
         # Run multiple times for timing metrics
-        latencies = []
+        latencies = [0.0] * run_count
         for i in range(run_count):
-            start_time = time.time()
-            results = search_fn(query=query, top_k=top_k)
-            end_time = time.time()
-            latency = (end_time - start_time) * 1000  # ms
-            latencies.append(latency)
+            search_kwargs = {"query": query, "top_k": top_k}
+            if i > 0:
+                search_kwargs["select"] = "id"
+            if method_name in self._EMBEDDING_METHODS:
+                search_kwargs["embedding"] = embedding
+            
+            t0 = time.perf_counter_ns()
+            results = search_fn(**search_kwargs)
+            latencies[i] = (time.perf_counter_ns() - t0) * 1e-6  # ms
             
             # Only need to save results once
             if i == 0:
@@ -185,7 +274,7 @@ class SearchEvaluator:
             retrieved_ids = [doc.get("id", "") for doc in search_results]
             
             # Calculate precision
-            relevant_retrieved = sum(1 for doc_id in retrieved_ids if doc_id in expected_results)
+            relevant_retrieved = sum(1 for doc_id in retrieved_ids if doc_id in expected_set)
             precision = relevant_retrieved / len(retrieved_ids) if retrieved_ids else 0
             
             # Calculate recall
@@ -203,11 +292,17 @@ class SearchEvaluator:
             }
         
         # Calculate timing metrics
+        n = len(latencies)
+        mean = sum(latencies) / n
+        ordered = sorted(latencies)
         timing_metrics = {
-            "mean_latency_ms": statistics.mean(latencies),
-            "min_latency_ms": min(latencies),
-            "max_latency_ms": max(latencies),
-            "stddev_latency_ms": statistics.stdev(latencies) if len(latencies) > 1 else 0,
+            "mean_latency_ms": mean,
+            "min_latency_ms": ordered[0],
+            "max_latency_ms": ordered[-1],
+            "stddev_latency_ms": (sum((x - mean) ** 2 for x in latencies) / (n - 1)) ** 0.5 if n > 1 else 0,
+            "p50_latency_ms": ordered[min(n - 1, int(n * 0.50))],
+            "p95_latency_ms": ordered[min(n - 1, int(n * 0.95))],
+            "p99_latency_ms": ordered[min(n - 1, int(n * 0.99))],
         }
         
         # Combine metrics
@@ -217,7 +312,137 @@ class SearchEvaluator:
         }
         
         return search_results, metrics
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        """
+        Get the embedding for a query, computing it at most once per query.
+        
+        Args:
+            query: Query string
+            
+        Returns:
+            Query embedding vector
+        """
+        embedding = self._embedding_cache.get(query)
+        if embedding is not None:
+            return embedding
+        
+        embedding = self._get_cached_embedding(query)
+        if embedding is None:
+            embedding = self.embedding_service.embed_query(query, fallback=False)
+            if embedding is not None:
+                self._put_cached_embedding(query, embedding)
+            else:
+                # Mock mode or a failed request: the random stand-in vector is
+                # used for this session only and never persisted
+                embedding = self.embedding_service.get_mock_embedding()
+        self._embedding_cache[query] = embedding
+        return embedding
+    
+    def _prefetch_embeddings(self, queries: List[str]) -> None:
+        """
+        Populate the embedding caches for a list of queries.
+        
+        Queries already in the persistent cache are skipped; the rest are
+        embedded with batched requests. Queries the service fails to embed
+        are left out of both caches and embedded again on first use.
+        
+        Args:
+            queries: Query strings to embed
+        """
+        # Track how many queries share a leading prefix with an earlier one
+        seen_prefixes = set()
+        prefix_hits = 0
+        for query in queries:
+            prefix = " ".join(query.split()[:self._PREFIX_TOKENS])
+            if prefix in seen_prefixes:
+                prefix_hits += 1
+            seen_prefixes.add(prefix)
+        with self._cache_lock:
+            self._cache_stats["prefix_hit_rate"] = prefix_hits / len(queries) if queries else 0.0
+        
+        missing = []
+        for query in dict.fromkeys(queries):
+            embedding = self._get_cached_embedding(query)
+            if embedding is None:
+                missing.append(query)
+            else:
+                self._embedding_cache[query] = embedding
+        
+        if not missing:
+            return
+        
+        # Sorting puts queries with shared prefixes in the same batch, which
+        # lets the service reuse work across them
+        missing.sort()
+        logger.info(f"Embedding {len(missing)} test queries in batches")
+        embeddings = self.embedding_service.embed_batch(missing)
+        for query, embedding in zip(missing, embeddings):
+            if embedding is None:
+                continue
+            self._put_cached_embedding(query, embedding)
+            self._embedding_cache[query] = embedding
+    
+    def _embedding_cache_key(self, query: str) -> str:
+        """
+        Build the persistent cache key for a query.
+        
+        The embedding deployment is part of the key so switching models
+        invalidates previously cached vectors.
+        
+        Args:
+            query: Query string
+            
+        Returns:
+            Hex digest identifying the query/model pair
+        """
+        versioned = f"{query}|{self.embedding_service.embedding_deployment}"
+        return hashlib.sha256(versioned.encode()).hexdigest()
+    
+    def _get_cached_embedding(self, query: str) -> Optional[List[float]]:
+        """
+        Look up a query embedding in the persistent cache.
+        
+        Args:
+            query: Query string
+            
+        Returns:
+            Cached embedding, or None on a miss
+        """
+        key = self._embedding_cache_key(query)
+        with self._cache_lock:
+            row = self._embedding_db.execute(
+                "SELECT vec FROM emb WHERE key = ?", (key,)
+            ).fetchone()
+            self._cache_stats["cache_hits" if row else "cache_misses"] += 1
+        
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
     
+    def _put_cached_embedding(self, query: str, embedding: List[float]) -> None:
+        """
+        Store a query embedding in the persistent cache.
+        
+        Nothing is stored while the embedding service is in mock mode: mock
+        vectors are random and share the cache key of the real embedding.
+        
+        Args:
+            query: Query string
+            embedding: Embedding vector to store
+        """
+        if self.embedding_service.use_mock:
+            return
+        
+        key = self._embedding_cache_key(query)
+        blob = np.asarray(embedding, dtype=np.float32).tobytes()
+        with self._cache_lock:
+            self._embedding_db.execute(
+                "INSERT OR REPLACE INTO emb (key, vec, created) VALUES (?, ?, ?)",
+                (key, blob, time.time())
+            )
+            self._embedding_db.commit()
+
     def _determine_best_method(self, methods_results: Dict[str, Any]) -> Dict[str, Any]:
         """
         Determine the best search method based on metrics.
@@ -268,34 +493,42 @@ class SearchEvaluator:
         
         return best_method
     
-    def _save_evaluation_results(self, query: str, results: Dict[str, Any]) -> None:
+    def _append_result(self, result: Dict[str, Any]) -> None:
         """
-        Save evaluation results to disk.
+        Append an evaluation result to the session's results stream.
         
         Args:
-            query: The query that was evaluated
-            results: Evaluation results
+            result: Evaluation result for one query
         """
-        # Create a filename based on timestamp and query
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        query_slug = "".join(c if c.isalnum() else "_" for c in query)[:30]
-        filename = f"{timestamp}_{query_slug}.json"
-        filepath = os.path.join(self.results_dir, filename)
-        
-        with open(filepath, "w") as f:
-            json.dump(results, f, indent=2)
-            
-        logger.info(f"Saved evaluation results to {filepath}")
+        if self._results_fh is None:
+            filepath = os.path.join(self.results_dir, f"{self._session_ts}_results.jsonl")
+            self._results_fh = open(filepath, "ab")
+            logger.info(f"Appending evaluation results to {filepath}")
+        
+        # Flush each record so results are on disk even if close() is never called
+        self._results_fh.write(dumps_json(result) + b"\n")
+        self._results_fh.flush()
     
-    def evaluate_test_set(self, test_file: str) -> Dict[str, Any]:
+    def evaluate_test_set(
+        self,
+        test_file: str,
+        keep_results: bool = True
+    ) -> Dict[str, Any]:
         """
         Evaluate a set of test queries from a file.
         
+        Results are saved to <timestamp>_test_set_results.jsonl (previously
+        a single .json document): one line per query's full result, followed
+        by a final {"_aggregated": ...} line holding the summary.
+        
         Args:
             test_file: Path to test file (JSON format)
+            keep_results: Also return every query's full result; pass False
+                for large test sets and read them from results_file instead
             
         Returns:
-            Aggregated evaluation results
+            Aggregated evaluation results, the path of the results file, and
+            unless keep_results is False the individual results
         """
         if not os.path.exists(test_file):
             logger.error(f"Test file not found: {test_file}")
@@ -315,48 +548,74 @@ class SearchEvaluator:
                     logger.error(f"Test case {i} missing 'query' field")
                     return {"error": f"Test case {i} missing 'query' field"}
             
-            # Run evaluation for each test case
-            results = []
-            for test_case in test_data:
-                query = test_case["query"]
-                expected_results = test_case.get("expected_results")
-                top_k = test_case.get("top_k", 5)
-                
-                eval_result = self.evaluate_query(
-                    query=query,
-                    expected_results=expected_results,
-                    top_k=top_k
-                )
-                results.append(eval_result)
+            # Embed all queries up front in batched requests
+            self._prefetch_embeddings([test_case["query"] for test_case in test_data])
             
-            # Aggregate results
-            aggregated = self._aggregate_results(results)
-            
-            # Save aggregated results
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{timestamp}_test_set_results.json"
+            # One clock read stamps both the aggregate and its filename
+            now = datetime.now()
+            timestamp = now.strftime("%Y%m%d_%H%M%S")
+            filename = f"{timestamp}_test_set_results.jsonl"
             filepath = os.path.join(self.results_dir, filename)
             
-            with open(filepath, "w") as f:
-                json.dump({"individual_results": results, "aggregated": aggregated}, f, indent=2)
+            # Full results are streamed to disk as they complete; without
+            # keep_results only the metrics stay in memory for aggregation
+            method_metrics = []
+            individual_results = [] if keep_results else None
+            with open(filepath, "wb") as results_fh:
+                for test_case in test_data:
+                    query = test_case["query"]
+                    expected_results = test_case.get("expected_results")
+                    top_k = test_case.get("top_k", 5)
+                    
+                    eval_result = self.evaluate_query(
+                        query=query,
+                        expected_results=expected_results,
+                        top_k=top_k,
+                        save=False
+                    )
+                    results_fh.write(dumps_json(eval_result) + b"\n")
+                    if keep_results:
+                        individual_results.append(eval_result)
+                    method_metrics.append({
+                        "methods": {
+                            method: {"metrics": data["metrics"]}
+                            for method, data in eval_result["methods"].items()
+                        }
+                    })
+                
+                # Aggregate results
+                aggregated = self._aggregate_results(method_metrics, now=now)
+                with self._cache_lock:
+                    aggregated["embedding_cache"] = dict(self._cache_stats)
+                
+                # The summary is the last line of the results file
+                results_fh.write(dumps_json({"_aggregated": aggregated}) + b"\n")
                 
             logger.info(f"Saved test set evaluation results to {filepath}")
             
-            return {
-                "individual_results": results,
+            output = {
+                "results_file": filepath,
                 "aggregated": aggregated
             }
+            if keep_results:
+                output["individual_results"] = individual_results
+            return output
                 
         except Exception as e:
             logger.error(f"Error evaluating test set: {str(e)}")
             return {"error": f"Error evaluating test set: {str(e)}"}
     
-    def _aggregate_results(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _aggregate_results(
+        self,
+        results: List[Dict[str, Any]],
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
         """
         Aggregate results from multiple evaluations.
         
         Args:
             results: List of individual evaluation results
+            now: Timestamp for the aggregate; defaults to the current time
             
         Returns:
             Aggregated metrics
@@ -364,48 +623,48 @@ class SearchEvaluator:
         aggregated = {
             "methods": {},
             "query_count": len(results),
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": (now or datetime.now()).isoformat(),
         }
         
-        # Initialize method aggregates
-        method_names = results[0]["methods"].keys()
-        for method in method_names:
-            aggregated["methods"][method] = {
-                "mean_latency_ms": [],
-                "precision": [],
-                "recall": [],
-                "f1": []
-            }
+        # One preallocated array per method and metric, filled in a single pass;
+        # relevance metrics missing for a query are left as NaN
+        method_names = list(results[0]["methods"].keys())
+        metric_keys = ("mean_latency_ms", "precision", "recall", "f1")
+        arrays = {
+            method: {key: np.full(len(results), np.nan) for key in metric_keys}
+            for method in method_names
+        }
         
-        # Collect metrics from all results
-        for result in results:
+        for i, result in enumerate(results):
             for method, data in result["methods"].items():
                 metrics = data["metrics"]
-                
-                # Add latency
-                aggregated["methods"][method]["mean_latency_ms"].append(metrics["mean_latency_ms"])
-                
-                # Add relevance metrics if available
-                if "precision" in metrics:
-                    aggregated["methods"][method]["precision"].append(metrics["precision"])
-                    aggregated["methods"][method]["recall"].append(metrics["recall"])
-                    aggregated["methods"][method]["f1"].append(metrics["f1"])
+                method_arrays = arrays[method]
+                for key in metric_keys:
+                    if key in metrics:
+                        method_arrays[key][i] = metrics[key]
         
         # Calculate averages
         for method in method_names:
-            # Calculate average latency
-            latencies = aggregated["methods"][method]["mean_latency_ms"]
-            aggregated["methods"][method]["avg_latency_ms"] = statistics.mean(latencies)
+            method_arrays = arrays[method]
+            latencies = method_arrays["mean_latency_ms"]
+            relevance = {key: method_arrays[key] for key in ("precision", "recall", "f1")}
+            relevance = {key: arr[~np.isnan(arr)] for key, arr in relevance.items()}
+            
+            method_aggregate = {
+                "mean_latency_ms": latencies.tolist(),
+                **{key: arr.tolist() for key, arr in relevance.items()},
+                "avg_latency_ms": float(np.nanmean(latencies)),
+                "p95_latency_ms": float(np.nanpercentile(latencies, 95)),
+                "p99_latency_ms": float(np.nanpercentile(latencies, 99)),
+            }
             
             # Calculate average relevance metrics if available
-            if aggregated["methods"][method]["precision"]:
-                precisions = aggregated["methods"][method]["precision"]
-                recalls = aggregated["methods"][method]["recall"]
-                f1s = aggregated["methods"][method]["f1"]
-                
-                aggregated["methods"][method]["avg_precision"] = statistics.mean(precisions)
-                aggregated["methods"][method]["avg_recall"] = statistics.mean(recalls)
-                aggregated["methods"][method]["avg_f1"] = statistics.mean(f1s)
+            if relevance["precision"].size:
+                method_aggregate["avg_precision"] = float(relevance["precision"].mean())
+                method_aggregate["avg_recall"] = float(relevance["recall"].mean())
+                method_aggregate["avg_f1"] = float(relevance["f1"].mean())
+            
+            aggregated["methods"][method] = method_aggregate
         
         # Determine best method overall
         if "avg_f1" in next(iter(aggregated["methods"].values())):
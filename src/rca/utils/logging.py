@@ -1,12 +1,22 @@
 """
 Logging utilities for the RCA system.
 """
+import atexit
 import json
 import logging
 import os
+import queue
 import sys
+import threading
+import time
 from datetime import datetime
-from typing import Any, Dict, Optional
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configure logging format
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -15,6 +25,34 @@ DEFAULT_LOG_LEVEL = "INFO"
 # Ensure log directory exists
 os.makedirs("logs", exist_ok=True)
 
+# Handlers shared by every logger from get_logger, created on first use so the
+# process holds a single log file descriptor
+_HANDLERS: Optional[List[logging.Handler]] = None
+
+
+def _get_handlers() -> List[logging.Handler]:
+    """
+    Create the shared console and file handlers once per process.
+    
+    Returns:
+        The shared handler list
+    """
+    global _HANDLERS
+    if _HANDLERS is None:
+        formatter = logging.Formatter(LOG_FORMAT)
+        
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(formatter)
+        
+        # delay=True defers opening the file until the first record is written
+        file_handler = RotatingFileHandler(
+            "logs/rca.log", maxBytes=10 << 20, backupCount=5, delay=True
+        )
+        file_handler.setFormatter(formatter)
+        
+        _HANDLERS = [console_handler, file_handler]
+    return _HANDLERS
+
 
 def get_logger(name: str) -> logging.Logger:
     """
@@ -34,23 +72,132 @@ def get_logger(name: str) -> logging.Logger:
     logger = logging.getLogger(name)
     logger.setLevel(log_level)
     
-    # Clear existing handlers to avoid duplicates
-    logger.handlers = []
+    # Attach the shared handlers once; repeat calls leave the logger untouched
+    for handler in _get_handlers():
+        if handler not in logger.handlers:
+            logger.addHandler(handler)
     
-    # Add console handler if not already present
-    if not any(isinstance(h, logging.StreamHandler) for h in logger.handlers):
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-        logger.addHandler(console_handler)
+    return logger
+
+
+def dumps_json(obj: Any) -> bytes:
+    """
+    Serialize an object to compact UTF-8 JSON, using orjson when installed.
     
-    # Add file handler if not already present
-    if not any(isinstance(h, logging.FileHandler) for h in logger.handlers):
-        log_file = f"logs/rca.log"
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-        logger.addHandler(file_handler)
+    numpy arrays and scalars are accepted; orjson encodes them natively
+    without converting each element to a Python float first.
     
-    return logger
+    Args:
+        obj: JSON-serializable object
+        
+    Returns:
+        Encoded JSON document
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(",", ":"), default=_json_default).encode()
+
+
+def _json_default(obj: Any) -> Any:
+    """Convert numpy arrays and scalars for the stdlib JSON encoder."""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Metrics records are written by a background thread so callers only enqueue
+_METRICS_BATCH_SIZE = 64
+_METRICS_FLUSH_INTERVAL = 0.05  # seconds
+_METRICS_STOP = object()
+_metrics_queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+_metrics_writer: Optional[threading.Thread] = None
+_metrics_writer_lock = threading.Lock()
+
+
+def _metrics_writer_loop() -> None:
+    """Drain the metrics queue, writing each batch with one write per file."""
+    files = {}
+    stopping = False
+    try:
+        while not stopping:
+            batch = [_metrics_queue.get()]
+            deadline = time.monotonic() + _METRICS_FLUSH_INTERVAL
+            while len(batch) < _METRICS_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(_metrics_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            # Group records by destination file
+            lines_by_path: Dict[str, List[bytes]] = {}
+            for item in batch:
+                if item is _METRICS_STOP:
+                    stopping = True
+                    continue
+                path, line = item
+                lines_by_path.setdefault(path, []).append(line)
+            
+            for path, lines in lines_by_path.items():
+                try:
+                    f = files.get(path)
+                    if f is None:
+                        f = files[path] = open(path, "ab")
+                    f.write(b"\n".join(lines) + b"\n")
+                    f.flush()
+                except Exception as e:
+                    get_logger("metrics_writer").warning(f"Failed to write metrics to file: {e}")
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def _enqueue_metrics(path: str, metrics: Dict[str, Any]) -> None:
+    """
+    Queue a metrics record for the background writer.
+    
+    Args:
+        path: JSONL file to append the record to
+        metrics: Metrics record
+    """
+    global _metrics_writer
+    try:
+        line = dumps_json(metrics)
+    except (TypeError, ValueError) as e:
+        get_logger("metrics_writer").warning(f"Failed to serialize metrics: {e}")
+        return
+    
+    if _metrics_writer is None:
+        with _metrics_writer_lock:
+            if _metrics_writer is None:
+                _metrics_writer = threading.Thread(
+                    target=_metrics_writer_loop, name="metrics-writer", daemon=True
+                )
+                _metrics_writer.start()
+    
+    _metrics_queue.put((path, line))
+
+
+def _reset_metrics_writer() -> None:
+    """Forget the parent's writer thread in a forked child; it does not survive fork."""
+    global _metrics_queue, _metrics_writer, _metrics_writer_lock
+    _metrics_queue = queue.SimpleQueue()
+    _metrics_writer = None
+    _metrics_writer_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_metrics_writer)
+
+
+@atexit.register
+def _flush_metrics() -> None:
+    """Stop the metrics writer after it has written everything queued."""
+    if _metrics_writer is not None and _metrics_writer.is_alive():
+        _metrics_queue.put(_METRICS_STOP)
+        _metrics_writer.join(timeout=1.0)
 
 
 def log_execution_metrics(
@@ -94,12 +241,7 @@ def log_execution_metrics(
     logger.info("Execution metrics", extra={"metrics": metrics})
     
     # Also log to a JSON file for analytics
-    try:
-        metrics_file = "logs/execution_metrics.jsonl"
-        with open(metrics_file, "a") as f:
-            f.write(json.dumps(metrics) + "\n")
-    except Exception as e:
-        logger.warning(f"Failed to write metrics to file: {e}")
+    _enqueue_metrics("logs/execution_metrics.jsonl", metrics)
 
 
 def log_conversation_metrics(
@@ -132,9 +274,4 @@ def log_conversation_metrics(
     logger.info("Conversation metrics", extra={"metrics": metrics})
     
     # Also log to a JSON file for analytics
-    try:
-        metrics_file = "logs/conversation_metrics.jsonl"
-        with open(metrics_file, "a") as f:
-            f.write(json.dumps(metrics) + "\n")
-    except Exception as e:
-        logger.warning(f"Failed to write metrics to file: {e}") 
\ No newline at end of file
+    _enqueue_metrics("logs/conversation_metrics.jsonl", metrics) 
\ No newline at end of file
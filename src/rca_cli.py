@@ -5,12 +5,32 @@ Allows direct interaction with the RCA system for testing.
 import argparse
 import json
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from src.rca.agents.base_agent import RCAAgent
-from src.rca.tracking.workflow import WorkflowTracker
+from src.rca.tracking.workflow import BatchedStorageBackend, WorkflowTracker
 from src.rca.tracking.storage import JSONFileStorage
 
+# Agent shared by every query in this process, built on first use
+_AGENT_SINGLETON: Optional[RCAAgent] = None
+
+
+def _get_agent() -> RCAAgent:
+    """
+    Get the shared RCA agent, creating it on the first call.
+    
+    Returns:
+        RCAAgent with file storage for workflow traces
+    """
+    global _AGENT_SINGLETON
+    if _AGENT_SINGLETON is None:
+        tracker = WorkflowTracker()
+        # The JSON copy is written from a background thread; main flushes it
+        # before the process exits
+        tracker.register_storage_backend(BatchedStorageBackend(JSONFileStorage("traces")))
+        _AGENT_SINGLETON = RCAAgent(tracker=tracker)
+    return _AGENT_SINGLETON
+
 
 def process_query(query: str, verbose: bool = False) -> Dict[str, Any]:
     """
@@ -26,10 +46,8 @@ def process_query(query: str, verbose: bool = False) -> Dict[str, Any]:
     # Start timing
     start_time = time.time()
     
-    # Initialize agent with file storage for workflow traces
-    tracker = WorkflowTracker()
-    tracker.register_storage_backend(JSONFileStorage("traces"))
-    agent = RCAAgent(tracker=tracker)
+    # Reuse the agent (and its clients) across queries
+    agent = _get_agent()
     
     # Process query
     if verbose:
@@ -122,6 +140,10 @@ def main():
     
     else:
         parser.print_help()
+    
+    # Make sure buffered trace writes land before the process exits
+    if _AGENT_SINGLETON is not None:
+        _AGENT_SINGLETON.tracker.flush()
 
 
 if __name__ == "__main__":
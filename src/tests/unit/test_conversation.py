@@ -50,6 +50,11 @@ class TestMessage(unittest.TestCase):
         """Test the string representation of a message."""
         message = Message(role="user", content="Hello")
         self.assertEqual(str(message), "user: Hello")
+    
+    def test_message_has_no_instance_dict(self):
+        """Test that messages use slots instead of a per-instance dict."""
+        message = Message(role="user", content="Hello")
+        self.assertFalse(hasattr(message, "__dict__"))
 
 
 class TestConversation(unittest.TestCase):
@@ -71,6 +76,15 @@ class TestConversation(unittest.TestCase):
         self.assertEqual(len(self.conversation.messages), 2)
         self.assertEqual(self.conversation.messages[1].role, "user")
         self.assertEqual(self.conversation.messages[1].content, "Hello")
+    
+    def test_history_is_read_only(self):
+        """Test that history cannot be changed behind the API payload's back."""
+        self.conversation.add_message("user", "Hello")
+        with self.assertRaises(AttributeError):
+            self.conversation.messages = []
+        with self.assertRaises(AttributeError):
+            self.conversation.messages[1].content = "Changed"
+        self.assertEqual(self.conversation.get_messages_for_api()[1]["content"], "Hello")
         
     def test_get_messages_for_api(self):
         """Test getting messages in the format required by the API."""
@@ -0,0 +1,93 @@
+"""
+Unit tests for the semantic intent cache.
+"""
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+import numpy as np
+
+# Fix import path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.chatbot.api.services.semantic_cache import SemanticCache
+from src.chatbot.api.services.execution_service import ExecutionMode, execution_service
+
+
+def bag_of_words_encoder(texts):
+    """Embed texts as normalized bag-of-words vectors over a tiny vocabulary."""
+    vocabulary = ["create", "repo", "repository", "new", "list", "pipelines", "delete"]
+    vectors = np.array(
+        [[text.lower().split().count(word) for word in vocabulary] for text in texts],
+        dtype=np.float32,
+    )
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class TestSemanticCache(unittest.TestCase):
+    """Test cases for the SemanticCache class."""
+
+    def setUp(self):
+        """Set up a cache with a deterministic encoder."""
+        self.cache = SemanticCache(threshold=0.8, max_entries=2, encoder=bag_of_words_encoder)
+
+    def test_similar_message_hits(self):
+        """Test that a close paraphrase returns the cached value."""
+        self.cache.add(self.cache.encode("create new repo"), ("create_repository", 0.8))
+        self.assertEqual(
+            self.cache.lookup(self.cache.encode("create a new repo please")),
+            ("create_repository", 0.8),
+        )
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_dissimilar_message_misses(self):
+        """Test that an unrelated message is not served from the cache."""
+        self.cache.add(self.cache.encode("create new repo"), ("create_repository", 0.8))
+        self.assertIsNone(self.cache.lookup(self.cache.encode("list pipelines")))
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the cache stays bounded and keeps recently used entries."""
+        self.cache.add(self.cache.encode("create new repo"), "create")
+        self.cache.add(self.cache.encode("list pipelines"), "list")
+        self.cache.lookup(self.cache.encode("create new repo"))
+        self.cache.add(self.cache.encode("delete repository"), "delete")
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.lookup(self.cache.encode("create new repo")), "create")
+        self.assertIsNone(self.cache.lookup(self.cache.encode("list pipelines")))
+
+
+class TestIntentResolution(unittest.TestCase):
+    """Test how the execution service uses the semantic cache."""
+    
+    def setUp(self):
+        """Use a cache whose encoder ignores the verb, so create/delete paraphrases collide."""
+        vocabulary_encoder = lambda texts: bag_of_words_encoder(
+            [" ".join(w for w in text.split() if w not in ("create", "delete")) for text in texts]
+        )
+        self.cache = SemanticCache(threshold=0.8, encoder=vocabulary_encoder)
+        patcher = patch.object(execution_service, "_semantic_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_auto_mode_ignores_cached_paraphrase_intent(self):
+        """Test that a close paraphrase with a different intent is not resolved from the cache."""
+        self.assertEqual(
+            execution_service._resolve_intent("create repo demo", ExecutionMode.AUTO)[0],
+            "create_repository",
+        )
+        self.assertEqual(
+            execution_service._resolve_intent("delete repo demo", ExecutionMode.AUTO)[0],
+            "delete_repository",
+        )
+    
+    def test_learn_mode_reuses_cached_intent(self):
+        """Test that LEARN mode, which never executes, serves paraphrases from the cache."""
+        execution_service._resolve_intent("create repo demo", ExecutionMode.LEARN)
+        self.assertEqual(
+            execution_service._resolve_intent("please create repo demo", ExecutionMode.LEARN)[0],
+            "create_repository",
+        )
+        self.assertEqual(self.cache.hits, 1)
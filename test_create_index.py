@@ -2,29 +2,24 @@
 Test script for creating an Azure Search index.
 This script creates a search index with the necessary fields and sample documents.
 """
+import functools
 import os
 import sys
 import json
 import time
 import logging
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-# Load environment variables from .env.azure
-env_file = os.path.join(Path(__file__).resolve().parent.parent.parent.parent, '.env.azure')
-if os.path.exists(env_file):
-    print(f"Loading environment from {env_file}")
-    load_dotenv(env_file)
-else:
-    print(f"ERROR: .env.azure file not found at {env_file}")
-    sys.exit(1)
+# This script lives at the project root
+project_root = Path(__file__).resolve().parent
 
 # Add the project root to the Python path
-project_root = Path(__file__).resolve().parent.parent.parent.parent
 sys.path.append(str(project_root))
 
-import requests
-from src.rca.connectors.embeddings import AzureAdaEmbeddingService
+# The connectors, numpy and dotenv are imported where they are used, so
+# importing this module (e.g. during test collection) stays cheap and has
+# no side effects
 
 # Configure logging
 logging.basicConfig(
@@ -34,8 +29,117 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Polling used to wait for an index deletion to propagate
+DELETE_POLL_ATTEMPTS = 20
+DELETE_POLL_INTERVAL = 0.1  # seconds
+
+# Index definition shared by every index name; see _index_definition_body
+_INDEX_DEFINITION_TEMPLATE = {
+    "fields": [
+        {
+            "name": "id",
+            "type": "Edm.String",
+            "key": True,
+            "searchable": False,
+            "filterable": True,
+            "sortable": True
+        },
+        {
+            "name": "content",
+            "type": "Edm.String",
+            "searchable": True,
+            "filterable": False,
+            "retrievable": True
+        },
+        {
+            "name": "metadata",
+            "type": "Edm.ComplexType",
+            "fields": [
+                {
+                    "name": "source",
+                    "type": "Edm.String",
+                    "searchable": True,
+                    "filterable": True,
+                    "retrievable": True
+                },
+                {
+                    "name": "category",
+                    "type": "Edm.String",
+                    "searchable": True,
+                    "filterable": True,
+                    "retrievable": True
+                }
+            ]
+        },
+        {
+            "name": "contentVector",
+            "type": "Collection(Edm.Single)",
+            "dimensions": 1536,
+            "vectorSearchConfiguration": "default"
+        }
+    ],
+    "vectorSearch": {
+        "algorithms": [
+            {
+                "name": "hnsw",
+                "kind": "hnsw",
+                "parameters": {
+                    "m": 4,
+                    "efConstruction": 400,
+                    "efSearch": 500,
+                    "metric": "cosine"
+                }
+            }
+        ],
+        "profiles": [
+            {
+                "name": "default",
+                "algorithm": "hnsw"
+            }
+        ]
+    },
+    "semantic": {
+        "configurations": [
+            {
+                "name": "default",
+                "prioritizedFields": {
+                    "titleField": {"fieldName": "metadata/source"},
+                    "prioritizedContentFields": [{"fieldName": "content"}],
+                    "prioritizedKeywordsFields": []
+                }
+            }
+        ]
+    }
+}
+
+
+@functools.lru_cache(maxsize=8)
+def _index_definition_body(index_name: str) -> bytes:
+    """Serialize the index definition for an index name once."""
+    from src.rca.utils.logging import dumps_json
+    return dumps_json({"name": index_name, **_INDEX_DEFINITION_TEMPLATE})
+
+
+def load_environment():
+    """Load environment variables from .env.azure, exiting if it is missing."""
+    from dotenv import load_dotenv
+    
+    env_file = os.path.join(project_root, '.env.azure')
+    if os.path.exists(env_file):
+        print(f"Loading environment from {env_file}")
+        load_dotenv(env_file)
+    else:
+        print(f"ERROR: .env.azure file not found at {env_file}")
+        sys.exit(1)
+
+
 def create_search_index():
     """Create the Azure AI Search index for testing."""
+    import numpy as np
+    from src.rca.connectors.embeddings import AzureAdaEmbeddingService
+    from src.rca.connectors.session import create_http_session
+    from src.rca.utils.logging import dumps_json
+    
     # Endpoint and API key
     endpoint = os.getenv("AZURE_SEARCH_ENDPOINT", "")
     admin_key = os.getenv("AZURE_SEARCH_ADMIN_KEY", "")
@@ -53,148 +157,84 @@ def create_search_index():
     print(f"Using Azure Search endpoint: {endpoint}")
     print(f"Index name: {index_name}")
     print(f"Admin key present: {'Yes' if admin_key else 'No'}")
-        
-    # Create the index definition
-    index_definition = {
-        "name": index_name,
-        "fields": [
-            {
-                "name": "id",
-                "type": "Edm.String",
-                "key": True,
-                "searchable": False,
-                "filterable": True,
-                "sortable": True
-            },
-            {
-                "name": "content",
-                "type": "Edm.String",
-                "searchable": True,
-                "filterable": False,
-                "retrievable": True
-            },
-            {
-                "name": "metadata",
-                "type": "Edm.ComplexType",
-                "fields": [
-                    {
-                        "name": "source",
-                        "type": "Edm.String",
-                        "searchable": True,
-                        "filterable": True,
-                        "retrievable": True
-                    },
-                    {
-                        "name": "category",
-                        "type": "Edm.String",
-                        "searchable": True,
-                        "filterable": True,
-                        "retrievable": True
-                    }
-                ]
-            },
-            {
-                "name": "contentVector",
-                "type": "Collection(Edm.Single)",
-                "dimensions": 1536,
-                "vectorSearchConfiguration": "default"
-            }
-        ],
-        "vectorSearch": {
-            "algorithms": [
-                {
-                    "name": "hnsw",
-                    "kind": "hnsw",
-                    "parameters": {
-                        "m": 4,
-                        "efConstruction": 400,
-                        "efSearch": 500,
-                        "metric": "cosine"
-                    }
-                }
-            ],
-            "profiles": [
-                {
-                    "name": "default",
-                    "algorithm": "hnsw"
-                }
-            ]
+    
+    # Sample documents to index once the index exists
+    documents = [
+        {
+            "id": "doc1",
+            "content": "This is a sample document about root cause analysis. When investigating issues, start by collecting all relevant logs and metrics.",
+            "metadata": {"source": "knowledge_base", "category": "rca"}
         },
-        "semantic": {
-            "configurations": [
-                {
-                    "name": "default",
-                    "prioritizedFields": {
-                        "titleField": {"fieldName": "metadata/source"},
-                        "prioritizedContentFields": [{"fieldName": "content"}],
-                        "prioritizedKeywordsFields": []
-                    }
-                }
-            ]
+        {
+            "id": "doc2",
+            "content": "Common techniques for troubleshooting include log analysis, monitoring metrics, and reviewing recent changes to the system.",
+            "metadata": {"source": "knowledge_base", "category": "troubleshooting"}
+        },
+        {
+            "id": "doc3",
+            "content": "When diagnosing issues, start with the most recent changes. Many problems can be traced back to recent deployments or configuration changes.",
+            "metadata": {"source": "best_practices", "category": "diagnostics"}
         }
-    }
+    ]
+    
+    # One pooled keep-alive session serves the index calls and the embedding
+    # request, so the TLS handshake happens once per host
+    session = create_http_session()
+    executor = ThreadPoolExecutor(max_workers=1)
     
     # Create the index
     try:
-        create_url = f"{endpoint}/indexes/{index_name}?api-version=2023-11-01"
+        index_url = f"{endpoint}/indexes/{index_name}?api-version=2023-11-01"
         headers = {
             "Content-Type": "application/json",
             "api-key": admin_key
         }
         
+        # The embeddings do not depend on the index, so generate them while
+        # the index is being (re)created
+        print("Creating sample documents with embeddings...")
+        embedding_service = AzureAdaEmbeddingService(session=session)
+        embeddings_future = executor.submit(
+            embedding_service.embed_documents, [doc["content"] for doc in documents]
+        )
+        
         # Check if index already exists
-        check_response = requests.get(f"{endpoint}/indexes/{index_name}?api-version=2023-11-01", headers=headers)
+        check_response = session.get(index_url, headers=headers)
         
         if check_response.status_code == 200:
             print(f"Index '{index_name}' already exists. Deleting it first...")
-            delete_response = requests.delete(f"{endpoint}/indexes/{index_name}?api-version=2023-11-01", headers=headers)
+            delete_response = session.delete(index_url, headers=headers)
             if delete_response.status_code != 204:
                 print(f"Failed to delete existing index: {delete_response.status_code} - {delete_response.text}")
                 return False
-            time.sleep(1)  # Wait for deletion to propagate
+            
+            # Wait for the deletion to propagate, polling instead of sleeping
+            # for a fixed interval
+            for _ in range(DELETE_POLL_ATTEMPTS):
+                if session.get(index_url, headers=headers).status_code == 404:
+                    break
+                time.sleep(DELETE_POLL_INTERVAL)
         
         # Create the index
-        response = requests.put(create_url, headers=headers, json=index_definition)
+        response = session.put(index_url, headers=headers, data=_index_definition_body(index_name))
         
         if response.status_code == 201:
             print(f"Index '{index_name}' created successfully")
             
-            # Generate embeddings for sample documents
-            print("Creating sample documents with embeddings...")
-            embedding_service = AzureAdaEmbeddingService()
+            # Get embeddings for the documents as one contiguous float32
+            # block; the index stores Edm.Single, so no precision is lost
+            embeddings = np.asarray(embeddings_future.result(), dtype=np.float32)
             
-            documents = [
-                {
-                    "id": "doc1",
-                    "content": "This is a sample document about root cause analysis. When investigating issues, start by collecting all relevant logs and metrics.",
-                    "metadata": {"source": "knowledge_base", "category": "rca"}
-                },
-                {
-                    "id": "doc2",
-                    "content": "Common techniques for troubleshooting include log analysis, monitoring metrics, and reviewing recent changes to the system.",
-                    "metadata": {"source": "knowledge_base", "category": "troubleshooting"}
-                },
-                {
-                    "id": "doc3",
-                    "content": "When diagnosing issues, start with the most recent changes. Many problems can be traced back to recent deployments or configuration changes.",
-                    "metadata": {"source": "best_practices", "category": "diagnostics"}
-                }
-            ]
-            
-            # Get embeddings for the documents
-            texts = [doc["content"] for doc in documents]
-            embeddings = embedding_service.embed_documents(texts)
-            
-            for i, doc in enumerate(documents):
-                doc["contentVector"] = embeddings[i]
+            for doc, vector in zip(documents, embeddings):
+                doc["contentVector"] = vector
             
             # Index the documents
-            index_url = f"{endpoint}/indexes/{index_name}/docs/index?api-version=2023-11-01"
+            docs_url = f"{endpoint}/indexes/{index_name}/docs/index?api-version=2023-11-01"
             index_payload = {
                 "value": documents
             }
             
-            index_response = requests.post(index_url, headers=headers, json=index_payload)
+            index_response = session.post(docs_url, headers=headers, data=dumps_json(index_payload))
             
             if index_response.status_code in (200, 201):
                 print(f"Successfully indexed {len(documents)} documents")
@@ -210,8 +250,12 @@ def create_search_index():
         logger.error(f"Error creating search index: {str(e)}")
         print(f"Error creating search index: {str(e)}")
         return False
-
+    
+    finally:
+        executor.shutdown(wait=True)
+        session.close()
 
 if __name__ == "__main__":
+    load_environment()
     print("Creating search index and indexing sample documents...")
     create_search_index() 
\ No newline at end of file
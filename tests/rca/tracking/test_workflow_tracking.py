@@ -3,52 +3,67 @@ Tests for the workflow tracking system integration.
 Tests both core tracking functionality and integration with CLI and API.
 """
 import os
-import time
+import sys
 import json
-import shutil
 import inspect
+import re
+import threading
 import pytest
-import subprocess
-from pathlib import Path
 from unittest.mock import patch, MagicMock
 
-from fastapi.testclient import TestClient
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-from src.rca.tracking.workflow import WorkflowTracker, WorkflowTrace
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from src.rca.tracking.workflow import (BatchedStorageBackend, FileStorageBackend,
+                                      WorkflowTrace, WorkflowTracker)
 from src.rca.tracking.storage import JSONFileStorage, InMemoryStorage
-from src.rca.agents.base_agent import RCAAgent
-from src.rca_cli import process_query
-from src.main import app
 
 # Constants for testing
-TEST_TRACES_DIR = "test_traces"
 TEST_QUERY = "What causes database connection timeout issues?"
+CLI_TRACKING_NAMES = re.compile(r"WorkflowTracker|register_storage_backend|JSONFileStorage|trace_id")
 
 
-# Fixtures
-@pytest.fixture(scope="function")
-def temp_trace_dir():
-    """Create a temporary directory for test traces."""
-    if os.path.exists(TEST_TRACES_DIR):
-        shutil.rmtree(TEST_TRACES_DIR)
-    os.makedirs(TEST_TRACES_DIR)
-    yield TEST_TRACES_DIR
-    shutil.rmtree(TEST_TRACES_DIR)
+# Helpers
+def _make_completed_trace(tracker):
+    """Start, record one step in, and complete a trace; return its ID."""
+    trace_id = tracker.start_trace(TEST_QUERY)
+    tracker.track_step(trace_id, "test_step", {}, {})
+    tracker.complete_trace(trace_id, "Test response")
+    return trace_id
 
 
-@pytest.fixture
+def _make_numpy_trace(array, **inputs):
+    """Build a completed trace whose step input holds a numpy array."""
+    trace = WorkflowTrace(query=TEST_QUERY)
+    step = trace.add_step("test_step", {"array": array, **inputs})
+    trace.complete_step(step, {})
+    trace.complete_workflow("Test response")
+    return trace
+
+
+# Fixtures
+# Tests only assert on traces they start themselves, so one tracker and
+# storage backend can be shared by all tests in a class
+@pytest.fixture(scope="class")
 def memory_storage():
     """Create a memory storage backend for testing."""
     return InMemoryStorage()
 
 
 @pytest.fixture
-def file_storage(temp_trace_dir):
+def file_storage(tmp_path):
     """Create a file storage backend for testing."""
-    return JSONFileStorage(temp_trace_dir)
+    return JSONFileStorage(str(tmp_path))
 
 
-@pytest.fixture
+@pytest.fixture(scope="class")
 def tracker(memory_storage):
     """Create a workflow tracker with memory storage."""
     tracker = WorkflowTracker()
@@ -57,9 +72,25 @@ def tracker(memory_storage):
 
 
 @pytest.fixture
+def backends(request):
+    """Resolve a backend combination name to its storage backend fixtures."""
+    fixture_names = {
+        "memory": ["memory_storage"],
+        "file": ["file_storage"],
+        "both": ["memory_storage", "file_storage"],
+    }[request.param]
+    return [request.getfixturevalue(name) for name in fixture_names]
+
+
+@pytest.fixture(scope="session")
 def test_client():
-    """Create a test client for the FastAPI app."""
-    return TestClient(app)
+    """Create a test client for the FastAPI app, shared by the whole session."""
+    # Imported here so tests that never touch the API skip loading the app
+    from fastapi.testclient import TestClient
+    from src.main import app
+    
+    with TestClient(app) as client:
+        yield client
 
 
 # Core WorkflowTracker Tests
@@ -140,12 +171,26 @@ class TestWorkflowTracker:
         assert trace_id not in tracker.active_traces
         assert trace in tracker.completed_traces
 
-    def test_trace_timing(self, tracker):
+    def test_in_memory_cap(self, memory_storage):
+        """Test that evicted traces are still served from storage."""
+        tracker = WorkflowTracker(in_memory_cap=2)
+        tracker.register_storage_backend(memory_storage)
+        
+        trace_ids = [tracker.start_trace(TEST_QUERY) for _ in range(3)]
+        for trace_id in trace_ids:
+            tracker.complete_trace(trace_id, "Test response")
+        
+        assert len(tracker.completed_traces) == 2
+        assert tracker.get_trace(trace_ids[0]).trace_id == trace_ids[0]
+
+    def test_trace_timing(self, tracker, monkeypatch):
         """Test that trace timing information is recorded."""
         trace_id = tracker.start_trace(TEST_QUERY)
         
-        # Add a small delay to ensure timing is measurable
-        time.sleep(0.01)
+        # Advance the tracker's monotonic clock by exactly 500 ms instead of sleeping
+        t0_ns = tracker.get_trace(trace_id)._t0_ns
+        monkeypatch.setattr("src.rca.tracking.workflow.time.perf_counter_ns",
+                            lambda: t0_ns + 500_000_000)
         
         # End the trace
         trace = tracker.complete_trace(trace_id, "Test response")
@@ -153,64 +198,167 @@ class TestWorkflowTracker:
         # Check timing
         assert trace.start_time is not None
         assert trace.end_time is not None
-        assert trace.end_time > trace.start_time
-        assert trace.duration_ms > 0
+        assert trace.end_time >= trace.start_time
+        assert trace.duration_ms == 500.0
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+    def test_forked_child_gets_distinct_trace_ids(self):
+        """Test that a forked child does not reuse the parent's trace IDs."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.write(write_fd, WorkflowTrace(query=TEST_QUERY).trace_id.encode())
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd, "rb") as pipe:
+            child_id = pipe.read().decode()
+        os.waitpid(pid, 0)
+        
+        parent_id = WorkflowTrace(query=TEST_QUERY).trace_id
+        assert child_id.split("-")[0] != parent_id.split("-")[0]
 
 
 # Storage Backend Tests
 class TestStorageBackends:
     """Tests for storage backends."""
 
-    def test_memory_storage(self, tracker, memory_storage):
-        """Test that traces are stored in memory storage."""
-        trace_id = tracker.start_trace(TEST_QUERY)
-        tracker.track_step(trace_id, "test_step", {}, {})
-        tracker.complete_trace(trace_id, "Test response")
+    @pytest.mark.parametrize("backends", ["memory", "file", "both"], indirect=True)
+    def test_storage_backends(self, backends, tmp_path):
+        """Test that completed traces reach every registered storage backend."""
+        tracker = WorkflowTracker()
+        for backend in backends:
+            tracker.register_storage_backend(backend)
+        
+        trace_id = _make_completed_trace(tracker)
+        
+        for backend in backends:
+            if isinstance(backend, JSONFileStorage):
+                # Check that the trace file exists and contains the correct data
+                trace_file = tmp_path / f"{trace_id}.json"
+                assert trace_file.exists()
+                raw = trace_file.read_bytes()
+                data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+                assert data["query"] == TEST_QUERY
+                assert len(data["steps"]) == 1
+            else:
+                # Check that the trace is in the storage
+                trace = backend.get_trace(trace_id)
+                assert trace is not None
+                assert trace.query == TEST_QUERY
+
+    def test_batched_storage(self, tmp_path):
+        """Test that queued traces are written by the background writer."""
+        backend = BatchedStorageBackend(FileStorageBackend(str(tmp_path)), batch_size=2)
+        tracker = WorkflowTracker()
+        tracker.register_storage_backend(backend)
+        
+        trace_ids = [tracker.start_trace(TEST_QUERY) for _ in range(3)]
+        for trace_id in trace_ids:
+            tracker.complete_trace(trace_id, "Test response")
         
-        # Check that the trace is in the storage
-        trace = memory_storage.get_trace(trace_id)
-        assert trace is not None
-        assert trace.query == TEST_QUERY
+        # load_traces flushes the queue before reading
+        stored_ids = {trace.trace_id for trace in backend.load_traces()}
+        assert stored_ids == set(trace_ids)
 
-    def test_file_storage(self, file_storage, temp_trace_dir):
-        """Test that traces are stored in file storage."""
-        # Create tracker with file storage
+    def test_file_storage_backend_round_trips_step_values(self, tmp_path):
+        """Test that interned and marker-like step values load back unchanged."""
+        backend = FileStorageBackend(str(tmp_path))
         tracker = WorkflowTracker()
-        tracker.register_storage_backend(file_storage)
+        tracker.register_storage_backend(backend)
         
-        # Create and complete a trace
+        outputs = {"user": {"__ref__": "user"}, "large": "x" * 4096}
         trace_id = tracker.start_trace(TEST_QUERY)
-        tracker.track_step(trace_id, "test_step", {}, {})
+        tracker.track_step(trace_id, "test_step", {}, outputs)
         tracker.complete_trace(trace_id, "Test response")
         
-        # Check that the trace file exists
-        trace_file = Path(temp_trace_dir) / f"{trace_id}.json"
-        assert trace_file.exists()
+        assert backend.get_trace(trace_id).steps[0].outputs == outputs
+        assert len(list((tmp_path / "blobs").iterdir())) == 1
+    
+    def test_pickle_keeps_numpy_arrays_out_of_band(self, tmp_path):
+        """Test that numpy arrays are framed out-of-band and load back unchanged."""
+        np = pytest.importorskip("numpy")
+        backend = FileStorageBackend(str(tmp_path))
+        trace = _make_numpy_trace(np.arange(1000.0))
+        assert backend.store_trace(trace) is True
         
-        # Check that the file contains the correct data
-        with open(trace_file, 'r') as f:
-            data = json.load(f)
-            assert data["query"] == TEST_QUERY
-            assert len(data["steps"]) == 1
-
-    def test_multiple_storages(self, memory_storage, file_storage, temp_trace_dir):
-        """Test that traces are stored in multiple storage backends."""
+        data = (tmp_path / f"{trace.trace_id}.pkl").read_bytes()
+        if zstandard is not None:
+            data = zstandard.ZstdDecompressor().decompress(data[len(b"ZST1"):])
+        assert data.startswith(b"PKB5")
+        
+        loaded = backend.get_trace(trace.trace_id)
+        np.testing.assert_array_equal(loaded.steps[0].inputs["array"], np.arange(1000.0))
+    
+    def test_json_format_round_trips_trace(self, tmp_path):
+        """Test that JSON trace files load back as equal, uninterned traces."""
+        backend = FileStorageBackend(str(tmp_path), format="json")
+        trace = WorkflowTrace(query=TEST_QUERY)
+        step = trace.add_step("test_step", {"top_k": 5})
+        trace.complete_step(step, {"user": {"__ref__": "user"}, "large": "x" * 4096})
+        trace.complete_workflow("Test response")
+        assert backend.store_trace(trace) is True
+        
+        assert (tmp_path / f"{trace.trace_id}.json").exists()
+        assert list((tmp_path / "blobs").iterdir()) == []
+        assert backend.get_trace(trace.trace_id).model_dump() == trace.model_dump()
+    
+    @pytest.mark.skipif(zstandard is None, reason="requires zstandard")
+    @pytest.mark.parametrize("format", ["pickle", "json"])
+    def test_trace_files_are_zstd_framed(self, tmp_path, format):
+        """Test that trace files are compressed, and uncompressed ones still load."""
         tracker = WorkflowTracker()
-        tracker.register_storage_backend(memory_storage)
-        tracker.register_storage_backend(file_storage)
+        tracker.register_storage_backend(FileStorageBackend(str(tmp_path), format=format))
+        trace_id = _make_completed_trace(tracker)
         
-        # Create and complete a trace
-        trace_id = tracker.start_trace(TEST_QUERY)
-        tracker.track_step(trace_id, "test_step", {}, {})
-        tracker.complete_trace(trace_id, "Test response")
+        trace_file = tmp_path / f"{trace_id}{FileStorageBackend.FORMATS[format]}"
+        data = trace_file.read_bytes()
+        assert data.startswith(b"ZST1")
+        
+        # Files written where zstandard was not installed carry no header
+        trace_file.write_bytes(zstandard.ZstdDecompressor().decompress(data[len(b"ZST1"):]))
+        loaded = FileStorageBackend(str(tmp_path), format=format).get_trace(trace_id)
+        assert loaded.steps[0].step_name == "test_step"
+    
+    def test_interrupted_blob_write_leaves_no_partial_blob(self, tmp_path):
+        """Test that a blob is only visible once it has been fully written."""
+        backend = FileStorageBackend(str(tmp_path))
+        trace = WorkflowTrace(query=TEST_QUERY)
+        trace.complete_step(trace.add_step("test_step", {"large": "x" * 4096}), {})
+        
+        with patch("src.rca.tracking.workflow.os.replace", side_effect=OSError("disk full")):
+            assert backend.store_trace(trace) is False
+        assert list((tmp_path / "blobs").iterdir()) == []
+        
+        assert backend.store_trace(trace) is True
+        assert backend.get_trace(trace.trace_id).steps[0].inputs["large"] == "x" * 4096
+    
+    def test_failed_write_does_not_leak_buffers_into_next_trace(self, tmp_path):
+        """Test that a trace that fails to pickle does not corrupt the next one."""
+        np = pytest.importorskip("numpy")
+        backend = FileStorageBackend(str(tmp_path))
         
-        # Check memory storage
-        trace = memory_storage.get_trace(trace_id)
-        assert trace is not None
+        # The array is handed out-of-band before the lock fails to pickle
+        failed = _make_numpy_trace(np.arange(10.0), lock=threading.Lock())
+        assert backend.store_trace(failed) is False
         
-        # Check file storage
-        trace_file = Path(temp_trace_dir) / f"{trace_id}.json"
-        assert trace_file.exists()
+        trace = _make_numpy_trace(np.arange(5.0))
+        assert backend.store_trace(trace) is True
+        loaded = backend.get_trace(trace.trace_id)
+        np.testing.assert_array_equal(loaded.steps[0].inputs["array"], np.arange(5.0))
+    
+    def test_batched_storage_survives_failed_write(self, memory_storage):
+        """Test that one failing write does not stop later writes or hang flush."""
+        backend = BatchedStorageBackend(memory_storage)
+        tracker = WorkflowTracker()
+        tracker.register_storage_backend(backend)
+        
+        with patch.object(memory_storage, "store_trace", side_effect=OSError("disk full")):
+            tracker.complete_trace(tracker.start_trace(TEST_QUERY), "Test response")
+            backend.flush()
+        
+        trace_id = _make_completed_trace(tracker)
+        assert backend.get_trace(trace_id) is not None
 
 
 # CLI Integration Tests
@@ -222,23 +370,22 @@ class TestCLIIntegration:
         # Check that the CLI module imports the tracking components
         import src.rca_cli
         source_code = inspect.getsource(src.rca_cli)
-        assert "WorkflowTracker" in source_code
-        assert "register_storage_backend" in source_code
-        assert "JSONFileStorage" in source_code
-        assert "trace_id" in source_code  # Checks for trace ID in output
+        
+        # trace_id checks for the trace ID in the output
+        expected = {"WorkflowTracker", "register_storage_backend", "JSONFileStorage", "trace_id"}
+        found = {match.group() for match in CLI_TRACKING_NAMES.finditer(source_code)}
+        assert found == expected, f"Missing from CLI source: {expected - found}"
 
-    @pytest.mark.integration
-    def test_cli_output_contains_trace_id(self):
+    def test_cli_output_contains_trace_id(self, monkeypatch, capsys):
         """Test that CLI output contains a trace ID."""
-        # This test requires the CLI to be runnable
-        # Skip it if we're not running integration tests
-        result = subprocess.run(
-            ["python", "-m", "src.rca_cli", TEST_QUERY, "--verbose"],
-            capture_output=True, text=True
-        )
+        from src.rca_cli import main as cli_main
+        
+        # Run the CLI entry point in-process instead of spawning an interpreter
+        monkeypatch.setattr(sys, "argv", ["rca_cli", TEST_QUERY, "--verbose"])
+        cli_main()
         
         # Check that the output contains a trace ID
-        assert "Trace ID:" in result.stdout
+        assert "Trace ID:" in capsys.readouterr().out
 
 
 # API Integration Tests
@@ -291,6 +438,9 @@ class TestPerformance:
     @pytest.mark.performance
     def test_tracking_overhead(self):
         """Test that workflow tracking doesn't add significant overhead."""
+        import timeit
+        from src.rca_cli import process_query
+        
         # This requires tracking to be optional in the process_query function
         # Mocking the function to simulate with/without tracking
         
@@ -299,25 +449,25 @@ class TestPerformance:
             MockAgent.return_value = mock_agent_instance
             mock_agent_instance.process.return_value = {"response": "Test response"}
             
+            # Warm up once so one-time agent construction and lazy imports
+            # are not counted as tracking overhead
+            process_query(TEST_QUERY, verbose=False)
+            
+            # timeit uses perf_counter; the best of several short repeats
+            # filters out scheduler noise better than one long loop
+            timer = timeit.Timer(lambda: process_query(TEST_QUERY, verbose=False))
+            
             # Time with tracking (normal operation)
-            start = time.time()
-            for _ in range(10):  # Reduced iterations to speed up tests
-                process_query(TEST_QUERY, verbose=False)
-            tracking_time = time.time() - start
+            tracking_time = min(timer.repeat(repeat=3, number=5))
             
             # Time without tracking (by mocking the tracker to do nothing)
             with patch('src.rca.tracking.workflow.WorkflowTracker.register_storage_backend'), \
                  patch('src.rca.tracking.workflow.WorkflowTracker.start_trace'), \
                  patch('src.rca.tracking.workflow.WorkflowTracker.track_step'), \
                  patch('src.rca.tracking.workflow.WorkflowTracker.complete_trace'):
-                
-                start = time.time()
-                for _ in range(10):  # Reduced iterations to speed up tests
-                    process_query(TEST_QUERY, verbose=False)
-                no_tracking_time = time.time() - start
+                no_tracking_time = min(timer.repeat(repeat=3, number=5))
             
-            # Verify overhead is acceptable (less than 100%)
-            # This is a very generous margin because we're running fewer iterations
-            # and the test environment may have high variability
-            assert tracking_time < no_tracking_time * 10, \
+            # Verify overhead is acceptable; the margin still allows for
+            # variable test environments
+            assert tracking_time < no_tracking_time * 3, \
                 f"Tracking adds too much overhead: {tracking_time:.4f}s vs {no_tracking_time:.4f}s" 
\ No newline at end of file
@@ -0,0 +1,3 @@
+"""
+RCA utilities test package initialization.
+""" 
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Tests for the search evaluator, run against mocked search and embedding services.
+"""
+import json
+import pytest
+from unittest.mock import patch
+
+from src.rca.utils.evaluation import SearchEvaluator
+
+# Constants for testing
+TEST_QUERY = "What causes database connection timeout issues?"
+TEST_EMBEDDING = [0.25] * 8
+
+
+# Helpers
+def _metrics_result(**methods):
+    """Build an evaluate_query-shaped result holding only per-method metrics."""
+    return {"methods": {name: {"metrics": metrics} for name, metrics in methods.items()}}
+
+
+# Fixtures
+@pytest.fixture
+def evaluator(tmp_path, monkeypatch):
+    """Create an evaluator whose services are mocks, writing under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    with patch("src.rca.utils.evaluation.create_http_session"), \
+         patch("src.rca.utils.evaluation.AzureAdaEmbeddingService") as MockEmbeddings, \
+         patch("src.rca.utils.evaluation.AzureSearchConnector") as MockConnector:
+        embedding_service = MockEmbeddings.return_value
+        embedding_service.use_mock = False
+        embedding_service.embedding_deployment = "test-deployment"
+        embedding_service.embed_query.return_value = TEST_EMBEDDING
+        
+        connector = MockConnector.return_value
+        connector.vector_search.return_value = [{"id": "doc1"}, {"id": "doc2"}]
+        connector.semantic_search.return_value = [{"id": "doc3"}]
+        connector.hybrid_search.return_value = [{"id": "doc1"}]
+        
+        evaluator = SearchEvaluator()
+        evaluator.initialized = True
+        yield evaluator
+        evaluator.close()
+
+
+class TestSearchEvaluator:
+    """Tests for SearchEvaluator."""
+
+    def test_evaluate_query(self, evaluator, tmp_path):
+        """Test that each method is benchmarked and scored against expected results."""
+        result = evaluator.evaluate_query(TEST_QUERY, expected_results=["doc1"], run_count=2)
+        
+        assert list(result["methods"]) == ["vector", "semantic", "hybrid"]
+        assert result["methods"]["vector"]["metrics"]["precision"] == 0.5
+        assert result["methods"]["semantic"]["metrics"]["recall"] == 0
+        assert result["best_method"]["for_relevance"] == "hybrid"
+        
+        # The query is embedded once and shared by the methods that need it
+        connector = evaluator.search_connector
+        evaluator.embedding_service.embed_query.assert_called_once()
+        assert connector.vector_search.call_args.kwargs["embedding"] == TEST_EMBEDDING
+        assert "embedding" not in connector.semantic_search.call_args.kwargs
+        
+        # The result is on disk before the evaluator is closed
+        (results_file,) = tmp_path.glob("data/evaluation/*_results.jsonl")
+        assert json.loads(results_file.read_text())["query"] == TEST_QUERY
+
+    def test_aggregate_results(self, evaluator):
+        """Test averaging across queries, skipping queries without relevance metrics."""
+        results = [
+            _metrics_result(
+                vector={"mean_latency_ms": 10.0, "precision": 1.0, "recall": 0.5, "f1": 0.5},
+                semantic={"mean_latency_ms": 30.0, "precision": 0.0, "recall": 0.0, "f1": 0.0},
+            ),
+            _metrics_result(
+                vector={"mean_latency_ms": 20.0},
+                semantic={"mean_latency_ms": 40.0},
+            ),
+        ]
+        
+        aggregated = evaluator._aggregate_results(results)
+        
+        assert aggregated["query_count"] == 2
+        assert aggregated["methods"]["vector"]["avg_latency_ms"] == 15.0
+        assert aggregated["methods"]["vector"]["avg_f1"] == 0.5
+        assert aggregated["methods"]["semantic"]["precision"] == [0.0]
+        assert aggregated["best_method"] == "vector"